@@ -0,0 +1,159 @@
+"""
+Every font, sound, image and table the game loads from resource/.
+
+Nothing is loaded when a module is imported. Each asset is loaded the first
+time get() asks for it, or ahead of time by a Loader on a background thread
+while loading_screen() shows how far it has got.
+"""
+import json
+import os
+import sys
+import threading
+
+import pygame
+
+ITEM_DIR = 'resource/img/item'
+
+# how to load each asset: what kind of asset it is, its path and any settings
+MANIFEST = {
+    'font': ('font', 'resource/font/Atarian/SF Atarian System.ttf', 20),
+    'bigfont': ('font',
+        'resource/font/Atarian/SF Atarian System Bold.ttf', 40),
+    'shoot': ('sound', 'resource/sound/laserShoot.wav', 0.1),
+    'shoot_quiet': ('sound', 'resource/sound/laserShoot.wav', 0.1),
+    'hurt': ('sound', 'resource/sound/hitHurt.wav', 0.4),
+    'coin': ('sound', 'resource/sound/pickupCoin.wav', 0.5),
+    'shop': ('json', 'resource/data/shop.json'),
+    'tile_data': ('json', 'resource/img/tile_data.json'),
+    'grass': ('image', 'resource/img/grass_tileset.png'),
+    'dirt': ('image', 'resource/img/dirt_tileset.png'),
+}
+
+# loaded assets, keyed by how they were loaded so assets loaded the same way
+# are only loaded once
+LOADED = {}
+LOCK = threading.Lock()
+
+def describe(name):
+    """
+    Return how to load the asset `name`. Shop items are named "item/" and the
+    item's name, and items without an image use the image "Unknown".
+    """
+    if name.startswith('item/'):
+        path = os.path.join(ITEM_DIR, name[len('item/'):] + '.png')
+        if not os.path.exists(path):
+            path = os.path.join(ITEM_DIR, 'Unknown.png')
+        return ('image', path, (0, 0, 0))
+    return MANIFEST[name]
+
+def init_mixer():
+    if not pygame.mixer.get_init():
+        pygame.mixer.init()
+        pygame.mixer.set_num_channels(8)
+
+def load(kind, path, *settings):
+    """
+    Load an asset from disk, where `settings` are a font's size, a sound's
+    volume or an image's transparent color.
+    """
+    if kind == 'font':
+        if not pygame.font.get_init():
+            pygame.font.init()
+        return pygame.font.Font(path, *settings)
+    if kind == 'sound':
+        init_mixer()
+        sound = pygame.mixer.Sound(path)
+        sound.set_volume(*settings)
+        return sound
+    if kind == 'image':
+        image = pygame.image.load(path)
+        if settings:
+            image.set_colorkey(*settings)
+        return image
+    if kind == 'json':
+        with open(path) as f:
+            return json.load(f)
+    raise ValueError(f"unknown kind of asset {kind!r}")
+
+def get(name):
+    """
+    Return the asset `name`, loading it the first time it is asked for. The
+    asset is shared, so it should not be changed.
+    """
+    description = describe(name)
+    with LOCK:
+        if description not in LOADED:
+            LOADED[description] = load(*description)
+        return LOADED[description]
+
+def channel(i):
+    """
+    Return the mixer's channel `i`, starting the mixer if it has not been.
+    """
+    init_mixer()
+    return pygame.mixer.Channel(i)
+
+def everything():
+    """
+    Return the name of every asset the game uses.
+    """
+    return list(MANIFEST) + ['item/' + item for item in get('shop')]
+
+
+class Loader(threading.Thread):
+    """
+    Loads assets on a background thread, so the game can show its window
+    while they load.
+
+    Attributes:
+        names: The names of the assets to load, every asset by default.
+        done: How many of them have been loaded.
+    """
+
+    def __init__(self, names=None):
+        super().__init__(daemon=True)
+        self.names = everything() if names is None else names
+        self.done = 0
+
+    def run(self):
+        for name in self.names:
+            get(name)
+            self.done += 1
+
+    def progress(self):
+        return self.done / max(len(self.names), 1)
+
+
+def loading_screen(screen, loader):
+    """
+    Draw a progress bar on `screen` until `loader` is done. Anything it
+    failed to load is loaded again here, so the error is raised.
+    """
+    w, h = screen.get_size()
+    bar = pygame.Rect(w // 4, h // 2 - 10, w // 2, 20)
+
+    clock = pygame.time.Clock()
+    while loader.is_alive():
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                sys.exit()
+
+        screen.fill((0, 0, 0))
+        pygame.draw.rect(screen, (255, 255, 255), bar, 2)
+        pygame.draw.rect(screen, (255, 255, 255), (bar.x, bar.y,
+            int(bar.w * loader.progress()), bar.h))
+        pygame.display.flip()
+        clock.tick(30)
+
+    for name in loader.names:
+        get(name)
+
+
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    for name in everything():
+        get(name)
+    print(f"{len(LOADED)} assets loaded in "
+        f"{(time.perf_counter() - start) * 1000:.1f} ms")
@@ -0,0 +1,141 @@
+"""
+Plays many Shop builds against recorded matches, one process per core, so the
+Shop's stat formulas can be balanced without playing.
+
+    python batch.py builds.json results.npz
+
+`builds.json` holds a list of builds like
+
+    {"stats": {"Reload": 2, "Damage": 4, "Speed": 2, "Agility": 3,
+               "Recovery": 2},
+     "inventory": ["Plasma", "Plasma", null, null],
+     "recording": "match.npy"}
+
+The stats are used as they are, like Shop.stats, so they already count the
+items in the inventory. The inventory only picks the player's gun. Each build
+plays every loop of its recording, or the first "loops" if given.
+
+The results are columns of an .npz file, one row per build: the enemies the
+build killed in all its loops, however they died, the money it was paid for
+them, the damage it took and the enemies left at the end of its last loop.
+"""
+# headless keeps pygame from opening a window or an audio device, so it is
+# imported before anything else that imports pygame
+from headless import Simulation
+
+import argparse
+import json
+import multiprocessing
+import time
+
+import numpy as np
+
+from soldier import Shop
+from world import Level
+
+STATS = ('Reload', 'Damage', 'Speed', 'Agility', 'Recovery')
+RESULTS = ('kills', 'money', 'damage_taken', 'enemies_left', 'frames')
+
+
+class Tally:
+    """
+    Stands in for the Shop while a build is played, counting what the Shop
+    would be paid. Enemies that die from burns are not paid for, so kills are
+    counted from the enemies instead.
+    """
+
+    def __init__(self):
+        self.money = 0
+
+    def collect(self, reward):
+        self.money += reward
+
+
+# every worker loads the shop, the level and each recording once
+shop = None
+level = None
+recordings = {}
+
+def living(world):
+    return sum(enemy.hp > 0 for enemy in world.enemies)
+
+def start_worker(level_path):
+    global shop, level
+    shop = Shop()
+    level = Level.from_image(level_path)
+
+def play(build):
+    """
+    Play one build and return its row of RESULTS.
+    """
+    shop.set_build(build)
+
+    path = build['recording']
+    if path not in recordings:
+        recordings[path] = np.load(path, mmap_mode='r')
+
+    tally = Tally()
+    sim = Simulation(builder=shop, shop=tally, level=level.snapshot())
+    kills = damage_taken = 0
+    for recording in recordings[path][:build.get('loops')]:
+        sim.play(recording)
+
+        # the persistent world is left as the loop started
+        kills += living(sim.world) - living(sim.instance)
+        damage_taken += sim.instance.damage_taken
+
+    # with no loops played, every enemy is left
+    enemies_left = living(sim.instance or sim.world)
+    return kills, tally.money, damage_taken, enemies_left, sim.frames
+
+def run(builds, level_path='level/test.png', processes=None):
+    """
+    Play every build across `processes` worker processes, one for each core
+    by default, and return the results as a dictionary of columns.
+    """
+    # pygame catches SIGTERM, so the workers are closed rather than
+    # terminated
+    pool = multiprocessing.Pool(processes, start_worker, (level_path,))
+    rows = pool.map(play, builds, chunksize=1)
+    pool.close()
+    pool.join()
+
+    # zip(*rows) has no columns at all when there are no builds
+    columns = {name: np.array([row[i] for row in rows])
+        for i, name in enumerate(RESULTS)}
+    for stat in STATS:
+        columns[stat] = np.array([build['stats'][stat] for build in builds],
+            dtype=int)
+    columns['inventory'] = np.array([[str(item) for item in
+        build.get('inventory', [None] * 4)] for build in builds],
+        dtype=str).reshape(len(builds), 4)
+    columns['recording'] = np.array([build['recording'] for build in builds],
+        dtype=str)
+    return columns
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play many Shop builds against recorded matches.")
+    parser.add_argument('builds', help="a .json list of builds")
+    parser.add_argument('results', help="the .npz file to write results to")
+    parser.add_argument('--processes', type=int, default=None,
+        help="how many worker processes to use, one per core by default")
+    parser.add_argument('--level', default='level/test.png',
+        help="the level image to play on")
+    args = parser.parse_args()
+
+    with open(args.builds) as f:
+        builds = json.load(f)
+
+    start = time.perf_counter()
+    columns = run(builds, args.level, args.processes)
+    elapsed = time.perf_counter() - start
+    np.savez(args.results, **columns)
+
+    print(f"{len(builds)} builds, {int(columns['frames'].sum())} frames in "
+        f"{elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,54 @@
 import pygame
 import numpy as np
 import json
+import os
+import hashlib
+from collections import OrderedDict
 from perlin_numpy import generate_fractal_noise_2d
 
-TILEDATA = json.load(open('resource/img/tile_data.json'))
-GRASS = pygame.image.load('resource/img/grass_tileset.png')
-DIRT = pygame.image.load('resource/img/dirt_tileset.png')
+import assets
+
+def split_tiles(image):
+    """
+    Return the pixels of every 16x16 tile in the image, in an array of shape
+    (columns, rows, 16, 16, 3).
+    """
+    pixels = pygame.surfarray.array3d(image)
+    w, h = pixels.shape[0] // 16, pixels.shape[1] // 16
+    return pixels[:w*16, :h*16].reshape(w, 16, h, 16, 3).transpose(
+        0, 2, 1, 3, 4)
+
+# every tile the ground can be drawn with, with the grass tile last, the
+# autotile codes in the tile data, sorted, and the index in TILES of each,
+# and a hash that changes whenever the tiles or how they are picked change.
+# load_tiles makes them the first time any ground is needed
+TILES = None
+CODES = None
+ATLAS = None
+TILESET_HASH = None
+
+def load_tiles():
+    global TILES, CODES, ATLAS, TILESET_HASH
+    if TILES is not None:
+        return
+
+    tile_data = assets.get('tile_data')
+    dirt_tiles = split_tiles(assets.get('dirt'))
+    TILES = np.concatenate((dirt_tiles.reshape(-1, 16, 16, 3),
+        split_tiles(assets.get('grass'))[5, 1][np.newaxis]))
+
+    CODES = np.array(sorted(int(code) for code in tile_data))
+    ATLAS = np.array([x * dirt_tiles.shape[1] + y
+        for x, y in (tile_data[str(code)] for code in CODES)])
+
+    TILESET_HASH = hashlib.sha1(TILES.tobytes() +
+        json.dumps(tile_data, sort_keys=True).encode()).hexdigest()
+
+# generated ground images are kept in memory, up to CACHE_SIZE of them, and
+# saved in CACHE_DIR so they are only ever generated once
+CACHE_DIR = 'cache/ground'
+CACHE_SIZE = 8
+CACHE = OrderedDict()
 
 def random_ground(shape, threshold=0.5):
     w, h = shape
@@ -18,15 +61,47 @@ def random_ground(shape, threshold=0.5):
 
     return np.where(noise > threshold, 1, 0)[:w, :h]
 
-def get_tile(image, x, y):
-    return image.subsurface((x*16, y*16, 16, 16))
+def ground_img(screensize, seed=0, threshold=0.5):
+    """
+    Return a Surface of randomly generated ground, loading it from the cache
+    if it has been generated before.
+    """
+    load_tiles()
+    key = hashlib.sha1(repr((tuple(screensize), seed, threshold,
+        TILESET_HASH)).encode()).hexdigest()
 
-def ground_img(screensize, seed=0):
+    if key in CACHE:
+        CACHE.move_to_end(key)
+        return CACHE[key]
+    
+    path = os.path.join(CACHE_DIR, key + '.png')
+    if os.path.exists(path):
+        surf = pygame.image.load(path)
+    else:
+        surf = generate_ground(screensize, seed, threshold)
+
+        # save under a temporary name first so other processes never load a
+        # half-written image
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            temp = os.path.join(CACHE_DIR, f"{key}.{os.getpid()}.png")
+            pygame.image.save(surf, temp)
+            os.replace(temp, path)
+        except (OSError, pygame.error):
+            pass
+    
+    CACHE[key] = surf
+    if len(CACHE) > CACHE_SIZE:
+        CACHE.popitem(last=False)
+    return surf
+
+def generate_ground(screensize, seed=0, threshold=0.5):
+    load_tiles()
     w = screensize[0] // 16
     h = screensize[1] // 16
 
     np.random.seed(seed)
-    ground = random_ground((w, h), threshold=0.5)
+    ground = random_ground((w, h), threshold=threshold)
 
     tile = np.zeros_like(ground)
 
@@ -66,14 +141,16 @@ def ground_img(screensize, seed=0):
     mult_and_add(tile, ((ground == np.roll(d, -1, axis=0)) &
         (ground == d) & (ground == r)), digit=9)
     
-    surf = pygame.Surface(screensize)
-
-    for x in range(w):
-        for y in range(h):
-            if ground[x, y] == 1:
-                surf.blit(get_tile(GRASS, 5, 1), (x*16, y*16))
-            else:
-                x1, y1 = TILEDATA[str(tile[x, y])]
-                surf.blit(get_tile(DIRT, x1, y1), (x*16, y*16))
+    # look up the tile for each autotile code
+    index = np.minimum(np.searchsorted(CODES, tile), len(CODES) - 1)
+    missing = (CODES[index] != tile) & (ground != 1)
+    if np.any(missing):
+        raise KeyError(str(tile[missing][0]))
+    index = np.where(ground == 1, len(TILES) - 1, ATLAS[index])
+
+    # lay the tiles out side by side
+    pixels = np.zeros((screensize[0], screensize[1], 3), dtype=np.uint8)
+    pixels[:w*16, :h*16] = TILES[index].transpose(0, 2, 1, 3, 4).reshape(
+        w*16, h*16, 3)
     
-    return surf
+    return pygame.surfarray.make_surface(pixels)
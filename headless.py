@@ -0,0 +1,131 @@
+"""
+Replays recorded matches without a window, sound or frame limiter.
+
+    python headless.py match.npy
+
+The recording is the file written by `python soldier.py match.npy`: one row of
+packed player actions (see replay.py) for every loop that was played. It is
+memory-mapped rather than read into memory. Each loop's player is made from
+the build saved with the recording, or an untouched Shop's if there is none.
+"""
+import os
+
+# pygame must never open a window or an audio device here
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import time
+
+import numpy as np
+
+from player import Unit
+from replay import load, unpack
+from soldier import Matrix, Shop, World
+from world import ChunkedLevel
+
+
+class Simulation:
+    """
+    Steps a World as fast as possible, the same way TimeKeeper does between
+    frames, but without drawing anything or waiting on a clock.
+
+    Attributes:
+        matrix: The Matrix of actions that the units play back.
+        world: The World that persists between loops. Ghosts advance one
+            second on it at the start of every loop.
+        instance: The copy of `world` that the current loop is played on.
+        builder: The Shop that makes each new player, the same way as in
+            TimeKeeper. A new Shop by default.
+        shop: Passed to World.update so kills are paid out. Optional.
+        frames: The number of frames simulated so far.
+        hashes: World.state_hash after every frame simulated, if asked for.
+    """
+
+    def __init__(self, num_players=20, per_second=30, spawn_rate=1,
+            builder=None, shop=None, level=None, hashes=False):
+        self.matrix = Matrix(num_players, per_second, spawn_rate)
+        self.world = World(level)
+        self.instance = None
+        self.builder = Shop() if builder is None else builder
+        self.shop = shop
+        self.frames = 0
+        self.hashes = [] if hashes else None
+
+        Unit.mute()
+
+    def step(self, world, frame, shop=None):
+        world.step(self.matrix, frame, shop)
+        self.frames += 1
+        if self.hashes is not None:
+            self.hashes.append(world.state_hash())
+
+    def play(self, recording, build=None):
+        """
+        Play one loop, where `recording` holds the new player's actions for
+        every frame of the loop, packed or not. The new player is made from
+        `build`, as saved by ReplayWriter, if it is given.
+        """
+        if build is not None:
+            self.builder.set_build(build)
+
+        # ghosts play their first second on the persistent world
+        for frame in range(self.matrix.fps):
+            self.step(self.world, frame)
+
+        self.world.begin_loop(self.matrix,
+            self.builder.create_player(self.world.spawn))
+        self.instance = self.world.snapshot()
+        self.instance.screenshake = np.zeros(2)
+        self.instance.damage_taken = 0
+
+        self.matrix[0][:len(recording)] = unpack(recording)
+        for frame in range(len(recording)):
+            self.step(self.instance, frame, self.shop)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay a recorded match and report its speed.")
+    parser.add_argument('recording', help="a .npy file saved by soldier.py")
+    parser.add_argument('--loops', type=int, default=None,
+        help="only replay this many loops")
+    parser.add_argument('--level', default=None,
+        help="a chunked level directory to play on instead of level/test.png")
+    parser.add_argument('--save-hashes', default=None,
+        help="write the state hash of every frame to this .npy file")
+    parser.add_argument('--check-hashes', default=None,
+        help="compare the state hash of every frame with this .npy file")
+    args = parser.parse_args()
+
+    recordings, builds = load(args.recording)
+    recordings = recordings[:args.loops]
+    builds = builds or [None] * len(recordings)
+
+    sim = Simulation(level=args.level and ChunkedLevel(args.level),
+        hashes=bool(args.save_hashes or args.check_hashes))
+    start = time.perf_counter()
+    for recording, build in zip(recordings, builds):
+        sim.play(recording, build)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(recordings)} loops, {sim.frames} frames in {elapsed:.2f} s "
+        f"({sim.frames / elapsed:.1f} frames/s)")
+
+    hashes = np.array(sim.hashes or [], dtype=np.uint64)
+    if args.save_hashes:
+        np.save(args.save_hashes, hashes)
+    if args.check_hashes:
+        expected = np.load(args.check_hashes)
+        frames = min(len(expected), len(hashes))
+        diverged = np.flatnonzero(expected[:frames] != hashes[:frames])
+        if len(diverged):
+            parser.exit(1, f"diverged on frame {diverged[0]}\n")
+        if len(expected) != len(hashes):
+            parser.exit(1, f"matched {frames} frames, but expected "
+                f"{len(expected)}\n")
+        print(f"all {frames} frames matched")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,21 @@
 from pickle import FALSE
 import pygame
 import numpy as np
-import skimage.draw as draw
 
-pygame.mixer.init()
-pygame.mixer.set_num_channels(8)
+import assets
 
 DEBUG = False
 
-shoot_channel = pygame.mixer.Channel(5)
+# shots are played on their own channel, so they never cut each other off
+SHOOT_CHANNEL = 5
+
+def length(vectors):
+    """
+    Return the length of each vector along the last axis, rounded the same
+    way np.linalg.norm rounds the length of a single vector.
+    """
+    return np.sqrt((vectors[..., None, :] @ vectors[..., :, None])[..., 0, 0])
+
 
 class Unit:
     """
@@ -17,14 +24,15 @@ class Unit:
     """
     SIDE = 20
 
-    SHOOT_SOUND = pygame.mixer.Sound('resource/sound/laserShoot.wav')
-    SHOOT_SOUND.set_volume(0.1)
-    SHOOT_QUIET = pygame.mixer.Sound('resource/sound/laserShoot.wav')
-    SHOOT_QUIET.set_volume(0.1)
-    HURT_SOUND = pygame.mixer.Sound('resource/sound/hitHurt.wav')
-    HURT_SOUND.set_volume(0.4)
     silent = False
 
+    # the unit's body and cursor as boolean masks, made on first use
+    BODY = None
+    CURSOR = None
+
+    # sprites and hitzone offsets, keyed by color and cursor offset in pixels
+    SPRITES = {}
+
     def __init__(self, pos, color):
         self.x, self.y = pos
         self.reload = 0 # time until next shot
@@ -52,6 +60,9 @@ class Unit:
 
         self.hitzone = np.array([])
 
+        # the position before the last World.step, for drawing between steps
+        self.last = None
+
         self.effects = []
     
     @staticmethod
@@ -65,33 +76,79 @@ class Unit:
     def get_pos(self):
         return np.array((self.x, self.y))
     
-    def draw(self, screen, camera):
-        # create a Surface object to draw the unit on first
-        unit = pygame.Surface((Unit.SIDE, Unit.SIDE))
-        unit.fill((0, 0, 0))
-        unit.set_colorkey((0, 0, 0))
+    @staticmethod
+    def draw_mask(center, radius):
+        """
+        Return a boolean mask of the pixels pygame fills for a circle.
+        """
+        surf = pygame.Surface((Unit.SIDE, Unit.SIDE))
+        surf.fill((0, 0, 0))
+        pygame.draw.circle(surf, (255, 255, 255), center, radius)
+        return np.any(pygame.surfarray.pixels3d(surf) != 0, 2)
+
+    @staticmethod
+    def get_sprite(color, cursor_loc):
+        """
+        Return the Surface for a unit of this color aiming at `cursor_loc`,
+        and the offsets of its pixels from the unit's position.
+        """
+        center = Unit.SIDE // 2
+
+        # pygame truncates the cursor's center to a whole pixel
+        dx = int(center + cursor_loc[0]) - center
+        dy = int(center + cursor_loc[1]) - center
+
+        key = (tuple(color), dx, dy)
+        if key in Unit.SPRITES:
+            return Unit.SPRITES[key]
+
+        if Unit.BODY is None:
+            Unit.BODY = Unit.draw_mask((center, center),
+                int(Unit.SIDE * 0.35))
+            Unit.CURSOR = Unit.draw_mask((center, center),
+                int(Unit.SIDE * 0.08))
+
+        # add the cursor to the body, moved by the cursor offset
+        mask = Unit.BODY.copy()
+        if abs(dx) < Unit.SIDE and abs(dy) < Unit.SIDE:
+            mask[max(0, dx):Unit.SIDE + min(0, dx),
+                 max(0, dy):Unit.SIDE + min(0, dy)] |= Unit.CURSOR[
+                 max(0, -dx):Unit.SIDE - max(0, dx),
+                 max(0, -dy):Unit.SIDE - max(0, dy)]
+
+        sprite = pygame.Surface((Unit.SIDE, Unit.SIDE))
+        sprite.fill((0, 0, 0))
+        sprite.set_colorkey((0, 0, 0))
+        pygame.surfarray.pixels3d(sprite)[mask] = color
+
+        offsets = np.argwhere(mask).astype(float) + 0.5 - center
+
+        Unit.SPRITES[key] = sprite, offsets
+        return sprite, offsets
+
+    def render(self):
+        """
+        Return the unit's Surface and save the pixels it covers in
+        `self.hitzone`. Does not need a display.
+        """
+        unit, offsets = Unit.get_sprite(self.color, self.cursor_loc)
+        self.hitzone = offsets + (self.x, self.y)
+        return unit
+
+    def draw(self, screen, camera, pos=None):
+        """
+        Draw the unit at `pos`, or at its position if `pos` is None. Only
+        drawing it at its position refreshes `self.hitzone`.
+        """
+        if pos is None:
+            unit = self.render()
+            pos = self.x, self.y
+        else:
+            unit, _ = Unit.get_sprite(self.color, self.cursor_loc)
 
         # get relative position of the unit
-        x = int(self.x - Unit.SIDE // 2 - camera[0])
-        y = int(self.y - Unit.SIDE // 2 - camera[1])
-
-        # save the center of the Surface
-        center_x, center_y = Unit.SIDE // 2, Unit.SIDE // 2
-
-        # draw a circle centered on the unit's position
-        pygame.draw.circle(unit, self.color, (center_x, center_y),
-            int(Unit.SIDE * 0.35))
-
-        # draw a cursor where the unit is aiming
-        pygame.draw.circle(unit, self.color,
-            (center_x + self.cursor_loc[0], center_y + self.cursor_loc[1]),
-            int(Unit.SIDE * 0.08))
-
-        # save all non-black pixels in the hitzone
-        self.hitzone = np.transpose(np.array(np.where(
-            np.any(pygame.surfarray.pixels3d(unit) != 0, 2)), dtype=float))
-        self.hitzone += (self.x, self.y)
-        self.hitzone += 0.5 - Unit.SIDE // 2
+        x = int(pos[0] - Unit.SIDE // 2 - camera[0])
+        y = int(pos[1] - Unit.SIDE // 2 - camera[1])
         
         # draw the unit on the screen
         screen.blit(unit, (x, y))
@@ -139,14 +196,25 @@ class Unit:
             direction, self, self.color, self.damage)
         # bullets.append(Bullet((self.x + direction[0], self.y + direction[1]),
         #     direction, self, self.color, self.damage))
-        if not Unit.silent and not shoot_channel.get_busy():
-            if self.id == 0:
-                # Unit.SHOOT_SOUND.play()
-                shoot_channel.play(Unit.SHOOT_SOUND)
-            else:
-                # Unit.SHOOT_QUIET.play()
-                shoot_channel.play(Unit.SHOOT_QUIET)
+        if not Unit.silent:
+            shoot_channel = assets.channel(SHOOT_CHANNEL)
+            sound = 'shoot' if self.id == 0 else 'shoot_quiet'
+            if not shoot_channel.get_busy():
+                shoot_channel.play(assets.get(sound))
             
+    def sweep(self, level, start, step, count):
+        """
+        Return how many of `count` moves of `step`, after first moving by
+        `start`, the unit can make before its hitzone touches a wall. Every
+        move is checked in a single query.
+        """
+        if count <= 0:
+            return 0
+        moves = np.arange(1, count + 1)[:, np.newaxis, np.newaxis] * step
+        blocked = np.any(level.query(self.hitzone + start + moves) != 0,
+            axis=1)
+        return int(np.argmax(blocked)) if np.any(blocked) else count
+    
     def move(self, speed: int, direction, level):
         if direction[0] == 0 and direction[1] == 0:
             return
@@ -154,15 +222,34 @@ class Unit:
         if self.hitzone.shape == (0,):
             return
         
-        direction = np.array(direction)
+        direction = np.array(direction, dtype=float)
         direction /= np.linalg.norm(direction)
 
-        # iteratively move the unit and check for collisions
-        for i in range(1, int(speed) + 1):
-            if np.any(level[self.hitzone + direction * i] != 0):
-                break
-            self.x += direction[0]
-            self.y += direction[1]
+        # move the unit as far as it can go in one pixel steps. When every
+        # pixel of the hitzone is far enough from the walls, it can always go
+        # the whole way.
+        count = int(speed)
+        if level.distance(self.hitzone).min() > count + 2:
+            free = count
+        else:
+            free = self.sweep(level, 0, direction, count)
+        moved = direction * free
+
+        # slide along the wall with the steps that are left, trying the
+        # larger part of the direction first
+        if free < count:
+            for axis in np.argsort(-np.abs(direction)):
+                if direction[axis] == 0:
+                    continue
+                step = np.zeros(2)
+                step[axis] = direction[axis]
+                slide = self.sweep(level, moved, step, count - free)
+                if slide:
+                    moved += step * slide
+                    break
+
+        self.x += moved[0]
+        self.y += moved[1]
 
 
 class Player(Unit):
@@ -200,7 +287,7 @@ class Player(Unit):
     def get_hurt(self, damage):
         self.speed = self.max_speed / (damage + 1)
         if self.id == 0 and not Unit.silent:
-            Unit.HURT_SOUND.play()
+            assets.get('hurt').play()
     
     def do_action(self, matrix, frame, bullets, level):
         self.update()
@@ -259,13 +346,54 @@ class Player(Unit):
         return [x, y, mouse_pressed[0], mouse_pressed[2]]
     
 
+def pooled(name, column=None):
+    """
+    Return a property that keeps an attribute in the `name` array of the
+    object's pool, at the object's slot.
+    """
+    if column is None:
+        def get(self):
+            return getattr(self.pool, name)[self.slot].item()
+
+        def set(self, value):
+            getattr(self.pool, name)[self.slot] = value
+    else:
+        def get(self):
+            return getattr(self.pool, name)[self.slot, column].item()
+
+        def set(self, value):
+            getattr(self.pool, name)[self.slot, column] = value
+
+    return property(get, set)
+
+
 class Enemy(Unit):
     """
     A unit that fires at the Player and has HP.
+
+    Enemies keep their position, health and timers in an EnemyPool so a
+    whole World's enemies can act at once. These attributes read and write
+    the pool.
     """
 
-    def __init__(self, pos):
-        super().__init__(pos, (255, 0, 0))
+    COLOR = (255, 0, 0)
+
+    x = pooled('pos', 0)
+    y = pooled('pos', 1)
+    hp = pooled('hp')
+    speed = pooled('speed')
+    reward = pooled('reward')
+    reload = pooled('reload')
+    reload_time = pooled('reload_time')
+    damage = pooled('damage')
+    prec_rad = pooled('prec_rad')
+    prec_time = pooled('prec_time')
+
+    def __init__(self, pos, pool):
+        self.pool = pool
+        self.slot = self.pool.add(self)
+
+        super().__init__(pos, Enemy.COLOR)
         self.speed = 3
         self.hp = 10
         self.reload = 0
@@ -273,6 +401,14 @@ class Enemy(Unit):
 
         self.reward = 2
     
+    @property
+    def cursor_loc(self):
+        return tuple(self.pool.cursor[self.slot].tolist())
+    
+    @cursor_loc.setter
+    def cursor_loc(self, value):
+        self.pool.cursor[self.slot] = value
+    
     def is_alive(self, _, __):
         return self.hp > 0
     
@@ -282,53 +418,48 @@ class Enemy(Unit):
             print(self.hp)
         if self.hp <= 0:
             self.hp = 0
+    
+    def add_effect(self, f):
+        super().add_effect(f)
+        self.pool.affected[self.slot] = True
         
-    def do_action(self, units, matrix, frame, bullets, level):
-        self.update()
-
-        if len(units) == 0:
-            return
-
-        # pick a player to target
-        def distance(unit):
-            denom = 1 if unit.is_alive(matrix, frame) else 1e-10
-            return np.linalg.norm(unit.get_pos() - self.get_pos()) / denom
-        target = min(units, key=distance)
-        target_dis = np.linalg.norm(target.get_pos() - self.get_pos())
-        
-        if target_dis > 300:
-            return
-        
-        # move towards the target if not too close
-        u_dir = (target.get_pos() - self.get_pos()) / np.linalg.norm(
-            target.get_pos() - self.get_pos())
-        if target_dis > 100:
-            # self.x += self.speed * u_dir[0]
-            # self.y += self.speed * u_dir[1]
-            self.move(self.speed, u_dir, level)
-
-        # set cursor location to where the unit is aiming
-        self.cursor_loc = (u_dir[0] * 0.45 * Unit.SIDE,
-            u_dir[1] * 0.45 * Unit.SIDE)
-        
-        # shoot at the target
-        if self.reload > 1:
-            self.reload -= 1
-            return
-        dx = Bullet.SPEED * u_dir[0]
-        dy = Bullet.SPEED * u_dir[1]
-        self.shoot(bullets, (dx, dy))
-        self.reload = self.reload_time
+    @staticmethod
+    def find_targets(own, units, matrix, frame):
+        """
+        Return how far each enemy position in `own` is from the unit it
+        targets, and the unit vector towards it. Enemies target the nearest
+        living unit, or the nearest dead one if none are alive.
+        """
+        own = np.asarray(own, dtype=float).reshape(-1, 2)
+        pos = np.array([unit.get_pos() for unit in units],
+            dtype=float).reshape(-1, 2)
+        alive = np.array([unit.is_alive(matrix, frame) for unit in units])
+
+        # every enemy's offset and distance to every unit at once
+        offset = pos[None, :] - own[:, None]
+        distance = length(offset)
+        target = np.argmin(distance / np.where(alive, 1, 1e-10), axis=1)
+
+        rows = np.arange(len(own))
+        target_dis = distance[rows, target]
+        return target_dis, offset[rows, target] / target_dis[:, None]
 
 
 class Bullet:
     """
     A short beam that travels in a single direction until it hits something.
+
+    Once added to a BulletPool, the pool moves the bullet and the Bullet is
+    only a handle to it. The handle's position and health are brought up to
+    date when the bullet is retired.
     """
 
     SPEED = 12
     LIFESPAN = 60
 
+    # explosion masks, keyed by radius
+    STENCILS = {}
+
     def __init__(self, pos, vel, parent, color, damage = 4):
         self.x, self.y = pos
         self.vel = vel
@@ -339,6 +470,7 @@ class Bullet:
         self.speed = np.sqrt(self.vel[0]**2 + self.vel[1]**2)
 
         self.collided = False
+        self.slot = None
     
     def is_alive(self):
         return self.health > 0 and not self.collided
@@ -346,87 +478,438 @@ class Bullet:
     def get_pos(self):
         return self.x, self.y
     
-    def get_explosion(self, center):
-        # return a list of points that make up the circular explosion
-        rad = int(np.sqrt(self.damage) * 3)
-        x0, y0 = center
-        
-        # create a list of points from x - rad to x + rad, y - rad to y + rad
-        points = []
-        for x in range(int(x0) - rad, int(x0) + rad + 1):
-            for y in range(int(y0) - rad, int(y0) + rad + 1):
-                if np.linalg.norm(np.array([x, y]) - center) <= rad:
-                    points.append((x, y))
-        
-        return np.array(points)
+    @staticmethod
+    def get_stencil(rad):
+        """
+        Return a square boolean mask of the circle of radius `rad`. Masks are
+        made once per radius.
+        """
+        if rad not in Bullet.STENCILS:
+            x, y = np.ogrid[-rad:rad + 1, -rad:rad + 1]
+            Bullet.STENCILS[rad] = x ** 2 + y ** 2 <= rad ** 2
+        return Bullet.STENCILS[rad]
+    
+    @staticmethod
+    def radius(damage):
+        return int(np.sqrt(damage) * 3)
+
 
-    def draw(self, screen, camera):
-        # get relative position of the bullet
-        x, y = self.x - camera[0], self.y - camera[1]
+class BulletPool:
+    """
+    Every bullet in a World, stored in parallel numpy arrays so they can be
+    moved and retired all at once. Empty slots have a health of 0 and are
+    reused by the next bullet that is added.
+
+    Guns add bullets as Bullet objects, which stay in `handles` while their
+    bullet is alive. Bullet types hook into hits through their handle, like
+    SoupBullet.on_hit. Bullets added in bulk with `extend` have no handle.
+
+    Attributes:
+        pos: The (x, y) of the front of each bullet.
+        vel: The (dx, dy) each bullet travels per frame.
+        health: Frames until each bullet disappears.
+        damage: The damage each bullet deals.
+        color: Each bullet's index in `colors`.
+        parent: The id of the unit that shot each bullet.
+        handles: The Bullet object in each slot, or None.
+        colors: Every color a bullet has been added with.
+        free: The empty slots.
+        newest: The last Bullet appended.
+    """
 
-        # draw a line from the front of the bullet to the back
-        pygame.draw.line(screen, self.color, (x, y),
-            (int(x - self.vel[0]), int(y - self.vel[1])), 3)
+    def __init__(self, capacity=64):
+        self.pos = np.zeros((capacity, 2))
+        self.vel = np.zeros((capacity, 2))
+        self.health = np.zeros(capacity, dtype=int)
+        self.damage = np.zeros(capacity)
+        self.color = np.zeros(capacity, dtype=int)
+        self.parent = np.zeros(capacity, dtype=int)
+        self.handles = np.full(capacity, None, dtype=object)
+
+        self.colors = []
+        self.free = list(range(capacity - 1, -1, -1))
+        self.newest = None
+    
+    def __len__(self):
+        return len(self.health) - len(self.free)
+    
+    def grow(self):
+        capacity = len(self.health)
+        self.pos = np.concatenate((self.pos, np.zeros((capacity, 2))))
+        self.vel = np.concatenate((self.vel, np.zeros((capacity, 2))))
+        self.health = np.concatenate((self.health, np.zeros(capacity, int)))
+        self.damage = np.concatenate((self.damage, np.zeros(capacity)))
+        self.color = np.concatenate((self.color, np.zeros(capacity, int)))
+        self.parent = np.concatenate((self.parent, np.zeros(capacity, int)))
+        self.handles = np.concatenate((self.handles,
+            np.full(capacity, None, dtype=object)))
+        self.free.extend(range(2 * capacity - 1, capacity - 1, -1))
+    
+    def append(self, bullet):
+        if not self.free:
+            self.grow()
+        i = self.free.pop()
+
+        self.pos[i] = bullet.x, bullet.y
+        self.vel[i] = bullet.vel
+        self.health[i] = bullet.health
+        self.damage[i] = bullet.damage
+        self.color[i] = self.get_color(bullet.color)
+        self.parent[i] = bullet.parent.id
+        self.handles[i] = bullet
+
+        bullet.slot = i
+        self.newest = bullet
+    
+    def extend(self, pos, vel, parent, colors, damage):
+        """
+        Add a new bullet for every row of `pos` and `vel`, without handles.
+        `parent` holds the id of the unit that shot each one and `colors`
+        their colors. Slots are taken in the same order as appending them one
+        at a time would.
+        """
+        count = len(pos)
+        slots = []
+        while len(slots) < count:
+            if not self.free:
+                self.grow()
+            take = min(count - len(slots), len(self.free))
+            slots += self.free[:-take - 1:-1]
+            del self.free[-take:]
+
+        self.pos[slots] = pos
+        self.vel[slots] = vel
+        self.health[slots] = Bullet.LIFESPAN
+        self.damage[slots] = damage
+        self.color[slots] = [self.get_color(color) for color in colors]
+        self.parent[slots] = parent
+        self.handles[slots] = None
+    
+    def get_color(self, color):
+        """
+        Return the index of `color` in `colors`, adding it if it is new.
+        """
+        if color not in self.colors:
+            self.colors.append(color)
+        return self.colors.index(color)
+    
+    def live(self):
+        return np.flatnonzero(self.health > 0)
+    
+    def retire(self, slots):
+        """
+        Empty the given slots, leaving each handle with its bullet's final
+        position and health.
+        """
+        for i in slots:
+            handle = self.handles[i]
+            if handle is None:
+                continue
+            handle.x, handle.y = self.pos[i]
+            handle.health = self.health[i]
+            handle.slot = None
+
+        self.handles[slots] = None
+        self.health[slots] = 0
+        self.free.extend(int(i) for i in slots)
+    
+    def get_pos(self, bullet):
+        if bullet.slot is None:
+            return bullet.get_pos()
+        return tuple(self.pos[bullet.slot])
+    
+    def get_bounds(self):
+        """
+        Return the box each bullet swept through this frame, with a margin, as
+        rows of (left, top, right, bottom).
+        """
+        back = self.pos - self.vel
+        return np.hstack((np.minimum(self.pos, back) - 4,
+            np.maximum(self.pos, back) + 4))
+    
+    def draw(self, screen, camera, alpha=1):
+        """
+        Draw every bullet, `alpha` of the way from where it was on the last
+        frame to where it is now.
+        """
+        for i in self.live():
+            # get relative position of the bullet
+            dx, dy = self.vel[i]
+            x, y = self.pos[i] - camera
+            if alpha != 1:
+                x, y = x - dx * (1 - alpha), y - dy * (1 - alpha)
+
+            # draw a line from the front of the bullet to the back
+            pygame.draw.line(screen, self.colors[self.color[i]], (x, y),
+                (int(x - dx), int(y - dy)), 3)
         
         if DEBUG:
-            left = x - (self.vel[0] if self.vel[0] > 0 else 0) - 4
-            right = x - (self.vel[0] if self.vel[0] < 0 else 0) + 4
-            top = y - (self.vel[1] if self.vel[1] > 0 else 0) - 4
-            bottom = y - (self.vel[1] if self.vel[1] < 0 else 0) + 4
-
-            pygame.draw.rect(screen, (255, 255, 0),
-                (left, top, right - left, bottom - top), 1)
+            for left, top, right, bottom in self.get_bounds()[self.live()]:
+                pygame.draw.rect(screen, (255, 255, 0), (left - camera[0],
+                    top - camera[1], right - left, bottom - top), 1)
 
     def move(self):
-        # move the bullet in the direction it is facing
-        self.x += self.vel[0]
-        self.y += self.vel[1]
-        self.health -= 1
-    
-    def distanceFromPoint(self, x, y, points: np.ndarray):
-        if self.vel[0] < 1:
-            return np.abs(points[:, 0] - x)
-        
-        if self.vel[1] < 1:
-            return np.abs(points[:, 1] - y)
-        
-        return np.abs(
-            -self.vel[0] * (x - points[:, 0]) -
-            -self.vel[1] * (y - points[:, 1])) / self.speed
+        # move every bullet in the direction it is facing
+        live = self.health > 0
+        self.pos[live] += self.vel[live]
+        self.health[live] -= 1
+
+        self.retire(np.flatnonzero(live & (self.health <= 0)))
     
-    def collide(self, unit):
-        if self.health == Bullet.LIFESPAN or unit.id == self.parent.id or \
+    def collide(self, i, unit):
+        if self.health[i] == Bullet.LIFESPAN or unit.id == self.parent[i] or \
             unit.hitzone.shape[0] == 0:
             return False
 
-        # get left, right, top, bottom of the bullet
-        left = self.x - (self.vel[0] if self.vel[0] > 0 else 0) - 4
-        right = self.x - (self.vel[0] if self.vel[0] < 0 else 0) + 4
-        top = self.y - (self.vel[1] if self.vel[1] > 0 else 0) - 4
-        bottom = self.y - (self.vel[1] if self.vel[1] < 0 else 0) + 4
+        x, y = self.pos[i]
+        dx, dy = self.vel[i]
+        left, top = min(x, x - dx) - 4, min(y, y - dy) - 4
+        right, bottom = max(x, x - dx) + 4, max(y, y - dy) + 4
+
+        points = unit.hitzone
+        if dx < 1:
+            distance = np.abs(points[:, 0] - x)
+        elif dy < 1:
+            distance = np.abs(points[:, 1] - y)
+        else:
+            distance = np.abs(-dx * (x - points[:, 0]) -
+                -dy * (y - points[:, 1])) / np.sqrt(dx ** 2 + dy ** 2)
 
         colliding = (
-            (left <= unit.hitzone[:, 0]) & (right >= unit.hitzone[:, 0]) &
-            (top <= unit.hitzone[:, 1]) & (bottom >= unit.hitzone[:, 1]) &
-            (self.distanceFromPoint(self.x, self.y, unit.hitzone) <= 2))
+            (left <= points[:, 0]) & (right >= points[:, 0]) &
+            (top <= points[:, 1]) & (bottom >= points[:, 1]) &
+            (distance <= 2))
         
         return np.any(colliding)
     
-    def collide_wall(self, level):
-        
-        back = np.array([self.x - self.vel[0], self.y - self.vel[1]],
-            dtype=int)
-        rr, cc = draw.line(int(self.x), int(self.y), back[0], back[1])
-        points = np.array(list(zip(rr, cc)))
+    def hit(self, i, unit):
+        """
+        Retire bullet `i` after it hits `unit`, letting its type react first.
+        """
+        handle = self.handles[i]
+        if handle is not None:
+            handle.collided = unit
+            if 'on_hit' in dir(handle):
+                handle.on_hit(unit)
+        self.retire([i])
+    
+    def collide_walls(self, level):
+        """
+        Retire every bullet that hit a wall this frame and blow a crater where
+        it hit. Bullets that leave the level are retired without a crater.
+        """
+        live = self.live()
+        if len(live) == 0:
+            return
+
+        # sample every bullet's path from back to front, at most a pixel apart
+        steps = int(np.ceil(np.abs(self.vel[live]).max())) + 1
+
+        # bullets far enough from every wall can not reach one this frame
+        back = self.pos[live] - self.vel[live]
+        reach = np.sqrt(np.sum(self.vel[live] ** 2, axis=1)) + 2
+        near = level.distance(back) <= reach
+        live, back = live[near], back[near]
+        vel = self.vel[live]
+
+        t = np.linspace(0, 1, steps)[None, :, None]
+        points = np.floor(back[:, None] + t * vel[:, None]).astype(int)
+
+        inside = level.contains(points)
+        solid = level.query(points) != 0
+
+        # the first solid point along each path is where the bullet hit
+        hit = np.flatnonzero(np.any(solid, axis=1))
+        first = np.argmax(solid[hit], axis=1)
+        for j, k in zip(hit, first):
+            if inside[j, k]:
+                rad = Bullet.radius(self.damage[live[j]])
+                level.carve(points[j, k], Bullet.get_stencil(rad), 0)
+            if self.handles[live[j]] is not None:
+                self.handles[live[j]].collided = True
+
+        self.retire(live[hit])
+
+
+class EnemyPool:
+    """
+    Every Enemy in a World, stored in parallel numpy arrays so they can all
+    aim, move and shoot at once. Enemies are never removed, so dead enemies
+    keep their slot with an hp of 0.
+
+    Attributes:
+        pos: The (x, y) of each enemy.
+        hp: Each enemy's health.
+        speed: How far each enemy moves per frame.
+        reward: The money each enemy is worth.
+        reload: Frames until each enemy can shoot.
+        reload_time: Frames between each enemy's shots.
+        damage: The damage each enemy's bullets deal.
+        prec_rad: How far each enemy's aim wanders.
+        prec_time: Frames each enemy has been updated for.
+        cursor: Where each enemy is aiming, from its center.
+        affected: Whether each enemy has effects, or colors left over from
+            effects, so it has to be updated on its own.
+        drawn: The pos and cursor each enemy's hitzone was last made at.
+        last: A copy of `pos` from before the last World.step, or None.
+        enemies: The Enemy in each slot.
+    """
+
+    FIELDS = ('pos', 'hp', 'speed', 'reward', 'reload', 'reload_time',
+        'damage', 'prec_rad', 'prec_time', 'cursor', 'affected', 'drawn')
+
+    def __init__(self, capacity=16):
+        self.pos = np.zeros((capacity, 2))
+        self.hp = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+        self.reward = np.zeros(capacity, dtype=int)
+        self.reload = np.zeros(capacity, dtype=int)
+        self.reload_time = np.zeros(capacity, dtype=int)
+        self.damage = np.zeros(capacity)
+        self.prec_rad = np.zeros(capacity)
+        self.prec_time = np.zeros(capacity, dtype=int)
+        self.cursor = np.zeros((capacity, 2))
+        self.affected = np.zeros(capacity, dtype=bool)
+        self.drawn = np.full((capacity, 4), np.nan)
+        self.last = None
+
+        self.enemies = []
+    
+    def __len__(self):
+        return len(self.enemies)
+    
+    def grow(self):
+        capacity = len(self.hp)
+        for name in EnemyPool.FIELDS:
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate((array, np.zeros_like(array))))
+        self.drawn[capacity:] = np.nan
+    
+    def add(self, enemy):
+        """
+        Give `enemy` the next slot and return it.
+        """
+        if len(self.enemies) == len(self.hp):
+            self.grow()
+        self.enemies.append(enemy)
+        return len(self.enemies) - 1
+    
+    def living(self):
+        return np.flatnonzero(self.hp[:len(self)] > 0)
+    
+    def render(self):
+        """
+        Refresh the hitzone of every living enemy, the same way Unit.render
+        would. Hitzones of enemies that have not moved or turned are kept.
+        """
+        living = self.living()
+        state = np.hstack((self.pos[living], self.cursor[living]))
+        stale = np.any(state != self.drawn[living], axis=1)
+        self.drawn[living[stale]] = state[stale]
+
+        # the offsets only depend on the cursor, not the color
+        for i in living[stale]:
+            _, offsets = Unit.get_sprite(Enemy.COLOR, self.cursor[i])
+            self.enemies[i].hitzone = offsets + self.pos[i]
+    
+    def update(self, units, matrix, frame, bullets, level):
+        """
+        Have every living enemy chase and shoot at the nearest unit.
+        """
+        active = self.living()
+        if len(active) == 0:
+            return
+
+        # only enemies with effects need Unit.update run on them
+        affected = self.affected[active]
+        self.prec_time[active[~affected]] += 1
+        for i in active[affected]:
+            enemy = self.enemies[i]
+            enemy.update()
+            self.affected[i] = bool(enemy.effects) or \
+                enemy.color != enemy.main_color
+
+        if len(units) == 0:
+            return
+
+        # aim at targets, ignoring the ones out of range
+        target_dis, u_dir = Enemy.find_targets(self.pos[active], units,
+            matrix, frame)
+        near = ~(target_dis > 300)
+        active, target_dis, u_dir = active[near], target_dis[near], u_dir[near]
+
+        # move towards the targets that are not too close
+        chase = target_dis > 100
+        self.move(active[chase], u_dir[chase], level)
+
+        self.cursor[active] = u_dir * 0.45 * Unit.SIDE
+
+        # shoot at the targets when reloaded
+        waiting = self.reload[active] > 1
+        self.reload[active[waiting]] -= 1
+        firing = active[~waiting]
+        self.shoot(bullets, firing, Bullet.SPEED * u_dir[~waiting])
+        self.reload[firing] = self.reload_time[firing]
+    
+    def move(self, slots, direction, level):
+        """
+        Move the enemies in `slots` the same way Unit.move would. Enemies far
+        enough from every wall move together; the rest move one at a time.
+        """
+        if len(slots) == 0:
+            return
+        unit_dir = direction / length(direction)[:, None]
+        count = self.speed[slots].astype(int)
+
+        # the clearance of each enemy's hitzone, like in Unit.move
+        hitzones = [self.enemies[i].hitzone for i in slots]
+        sizes = np.array([len(hitzone) for hitzone in hitzones])
+        drawn = sizes > 0
+        clearance = np.full(len(slots), -1)
+        if np.any(drawn):
+            distance = level.distance(np.concatenate(
+                [hitzone for hitzone in hitzones if len(hitzone)]))
+            starts = np.cumsum(sizes[drawn]) - sizes[drawn]
+            clearance[drawn] = np.minimum.reduceat(distance, starts)
+
+        free = (clearance > count + 2) & np.all(np.isfinite(unit_dir), axis=1)
+        self.pos[slots[free]] += unit_dir[free] * count[free, None]
+
+        for i in np.flatnonzero(drawn & ~free):
+            self.enemies[slots[i]].move(self.speed[slots[i]], direction[i],
+                level)
+    
+    def shoot(self, bullets, slots, direction):
+        """
+        Fire a bullet from each enemy in `slots` the same way Unit.shoot would,
+        adding them all to `bullets` at once.
+        """
+        if len(slots) == 0:
+            return
+        prec = np.sin(self.prec_time[slots]) + \
+            np.sin(2 * self.prec_time[slots]) / 360
+        prec *= self.prec_rad[slots]
+
+        dx, dy = direction.T
+        dis = np.sqrt(dx ** 2 + dy ** 2)
+        dx = dx / dis
+        dy = dy / dis
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            angle = np.where(dy == 0, dx * np.pi / 2,
+                np.arctan(dx / dy) * np.where(dx > 0, 1, -1))
+        angle += prec
 
-        colliding = level[points]
-        self.collided = np.any(colliding)
-        if self.collided:
-            center = min(points[level[points] > 0],
-                key=lambda p: np.linalg.norm(p - back))
-            level.set_at(self.get_explosion(center), 0)
+        vel = np.stack((np.cos(angle) * dis, np.sin(angle) * dis), axis=1)
+        shooters = [self.enemies[i] for i in slots]
+        bullets.extend(self.pos[slots] + vel, vel,
+            [enemy.id for enemy in shooters],
+            [enemy.color for enemy in shooters], self.damage[slots])
 
-        return self.collided
+        if not Unit.silent:
+            shoot_channel = assets.channel(SHOOT_CHANNEL)
+            if not shoot_channel.get_busy():
+                shoot_channel.play(assets.get('shoot_quiet'))
 
 
 # Characters
@@ -475,7 +958,7 @@ class Minotaur(Player):
         
         # move the character
         if self.ride:
-            self.x, self.y = self.ride.get_pos()
+            self.x, self.y = bullets.get_pos(self.ride)
         elif distance > 4 and not actions[2]:
             self.x += speed * u_dir[0]
             self.y += speed * u_dir[1]
@@ -494,7 +977,7 @@ class Minotaur(Player):
             dy = Bullet.SPEED * u_dir[1]
             self.shoot(bullets, (dx, dy))
             if not self.ride and not actions[2]:
-                self.ride = bullets[-1]
+                self.ride = bullets.newest
 
 # Blood-bender
 # Summons bullets from in-range corpses
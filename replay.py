@@ -0,0 +1,144 @@
+"""
+Compact recordings of the player's actions.
+
+Each frame of Player.read_action is packed into an ACTION record: the mouse
+offset from the center of the screen as two int16s, and the mouse buttons as
+bit flags. A recording is a .npy file of these records with one row per loop,
+so it can be memory-mapped with np.load(path, mmap_mode='r').
+
+The build of each loop's new player, the shop stats and inventory it was made
+with, is saved next to the recording as a .json list, one build per loop.
+"""
+import json
+import os
+
+import numpy as np
+
+ACTION = np.dtype([('x', '<i2'), ('y', '<i2'), ('flags', 'u1')])
+
+# bits of an ACTION's flags, for actions 2 and 3 of Player.read_action
+STOP = 1
+SHOOT = 2
+
+
+def pack(actions):
+    """
+    Return the rows of [x, y, stop, shoot] in `actions` as ACTION records.
+    """
+    actions = np.asarray(actions)
+    limit = np.iinfo(np.int16)
+
+    records = np.zeros(actions.shape[:-1], dtype=ACTION)
+    records['x'] = np.clip(actions[..., 0], limit.min, limit.max)
+    records['y'] = np.clip(actions[..., 1], limit.min, limit.max)
+    records['flags'] = (actions[..., 2] != 0) * STOP | \
+        (actions[..., 3] != 0) * SHOOT
+    return records
+
+def unpack(records):
+    """
+    Return ACTION records as rows of [x, y, stop, shoot], the way a Matrix
+    holds them. Recordings saved as rows of actions are returned as they are.
+    """
+    if records.dtype != ACTION:
+        return records
+
+    actions = np.empty(records.shape + (4,))
+    actions[..., 0] = records['x']
+    actions[..., 1] = records['y']
+    actions[..., 2] = (records['flags'] & STOP) != 0
+    actions[..., 3] = (records['flags'] & SHOOT) != 0
+    return actions
+
+
+def builds_path(path):
+    """
+    Return where the builds of the recording at `path` are saved.
+    """
+    return os.path.splitext(path)[0] + '.builds.json'
+
+def load(path):
+    """
+    Return the memory-mapped loops of the recording at `path` and the build
+    of each loop, or None for the builds if they were not saved.
+    """
+    recording = np.load(path, mmap_mode='r')
+    try:
+        with open(builds_path(path)) as f:
+            builds = json.load(f)[:len(recording)]
+    except FileNotFoundError:
+        builds = None
+    return recording, builds
+
+
+class ReplayWriter:
+    """
+    Writes a recording to disk one frame at a time. The loop being recorded is
+    a memory-mapped row at the end of the file, and the header only counts
+    finished loops, so the file can be loaded at any time.
+
+    Attributes:
+        path: Where the recording is written.
+        frames: The number of frames in every loop.
+        loops: The number of finished loops.
+        row: The memory-mapped records of the loop being recorded, or None.
+        builds: The build of every loop begun, saved to builds_path(path).
+    """
+
+    def __init__(self, path, frames):
+        self.path = path
+        self.frames = frames
+        self.loops = 0
+        self.row = None
+        self.builds = []
+
+        with open(self.path, 'wb') as f:
+            self.write_header(f)
+            self.offset = f.tell()
+
+    def write_header(self, f):
+        # numpy pads the header so the number of loops can grow in place
+        np.lib.format.write_array_header_1_0(f, {
+            'descr': np.lib.format.dtype_to_descr(ACTION),
+            'fortran_order': False,
+            'shape': (self.loops, self.frames)})
+
+    def begin_loop(self, build):
+        """
+        Start recording a new loop in the row after the finished ones, played
+        by a player made from `build`, a dictionary of its stats and
+        inventory.
+        """
+        self.builds = self.builds[:self.loops] + [build]
+        with open(builds_path(self.path), 'w') as f:
+            json.dump(self.builds, f)
+
+        size = self.frames * ACTION.itemsize
+        start = self.offset + self.loops * size
+        with open(self.path, 'r+b') as f:
+            f.truncate(start + size)
+
+        self.row = np.memmap(self.path, ACTION, 'r+', start, (self.frames,))
+        self.row[:] = 0
+
+    def save_action(self, frame, actions):
+        self.row[frame] = pack(actions)
+
+    def end_loop(self):
+        """
+        Count the loop being recorded as finished.
+        """
+        self.row.flush()
+        self.row = None
+        self.loops += 1
+
+        with open(self.path, 'r+b') as f:
+            self.write_header(f)
+
+
+if __name__ == "__main__":
+    import sys
+
+    recording = np.load(sys.argv[1], mmap_mode='r')
+    print(f"{recording.shape[0]} loops of {recording.shape[1]} frames, "
+        f"{recording.nbytes} bytes")
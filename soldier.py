@@ -1,98 +1,126 @@
 import pygame
 import sys
 import numpy as np
-from copy import deepcopy
+from copy import copy, deepcopy
 
+import hashlib
 import random
 import time
-import json
 
+import assets
 from player import *
-from world import Level
+from replay import ReplayWriter
+from text import CachedFont
+from world import Grid, Level
 
-pygame.init()
-pygame.mixer.init()
-
-FONT = pygame.font.Font('resource/font/Atarian/SF Atarian System.ttf', 20)
-BIGFONT = pygame.font.Font('resource/font/Atarian/SF Atarian System Bold.ttf',
-    40)
+FONT = CachedFont('font')
+BIGFONT = CachedFont('bigfont')
 
 class Matrix:
     """
     A numpy array that saves instructions for each player unit's actions.
+
+    Each loop's actions are one row of a ring buffer. The unit with id k
+    plays the row from k loops ago, starting k seconds in, so starting a new
+    loop only moves `head` instead of moving any actions.
     """
 
     def __init__(self, num_players=20, per_second=30, spawn_rate=1, actions=4):
-        assert num_players % 2 == 0
         self.num_players = num_players
         self.per_second = per_second
         self.spawn_rate = spawn_rate
         self.actions = actions
         
         self.fps = self.spawn_rate * self.per_second
-        self.data_height = num_players // 2
-        self.data_width = (num_players + 1) * self.fps
-        self.data = np.zeros((self.data_height, self.data_width, actions))
+        self.data = np.zeros((num_players, num_players * self.fps, actions))
+        self.head = 0
     
     def __getitem__(self, key):
-        if key >= self.data_height:
-            start = self.fps * (self.num_players - key)
-            return self.data[self.num_players - key - 1, -start:]
-        else:
-            end = self.fps * (self.num_players - key)
-            return self.data[key, :end]
+        return self.data[(self.head - key) % self.num_players, self.fps * key:]
     
     def save_action(self, frame, actions):
-        self.data[0, frame, :] = actions
+        self.data[self.head, frame, :] = actions
     
     def rotate(self):
         """
-        The matrix saves data with two units' actions per row. So the shortest-
-        living unit and longest-living unit are in the same row. This function
-        cuts out one second of each unit's actions and moves the data to the
-        next row.
+        Give every unit's actions to the next id, and start an empty row for
+        the new player in place of the oldest loop.
         """
-        for i in range(1, self.data_height):
-            self.data[i-1, -self.fps*i:] = self.data[i, -self.fps*i:]
-        bottom = self.data_height - 1
-        half = self.data_height * self.fps
-        self.data[bottom, -half:] = self.data[bottom, :half]
-        for i in range(self.data_height-1, 0, -1):
-            end = self.fps * (self.data_height * 2 - i)
-            self.data[i, :end] = self.data[i-1, self.fps:self.fps+end]
-        self.data[0, :-self.fps] = 0
+        self.head = (self.head + 1) % self.num_players
+        self.data[self.head] = 0
 
 
 class World:
+    """
+    Everything that is simulated in one loop. Stepping a World only depends
+    on its state, the Matrix and `random`, which is seeded, so the same
+    actions always play out the same way.
+    """
 
-    def __init__(self):
-        self.bullets = []
+    def __init__(self, level=None, seed=0):
+        self.bullets = BulletPool()
         self.units = []
-        self.enemies = []
+        self.enemy_pool = EnemyPool()
+        self.enemies = self.enemy_pool.enemies
 
-        self.level = Level.from_image('level/test.png')
+        if level is None:
+            level = Level.from_image('level/test.png')
+        self.level = level
         self.spawn = self.level.spawn
 
         for loc in self.level.enemies:
-            self.enemies.append(Enemy(loc))
+            Enemy(loc, self.enemy_pool)
 
         self.screenshake = np.zeros(2)
+        self.random = random.Random(seed)
+
+        # the total damage dealt to the player, who has no health to lose
+        self.damage_taken = 0
     
     def __deepcopy__(self, memo):
-        new_world = World()
+        return self.snapshot(memo)
+    
+    def snapshot(self, memo=None):
+        """
+        Return a copy of the world that can be played without changing this
+        one. The level's ground and spawn points are shared, and its terrain
+        is only copied when either world changes it, so nothing is loaded
+        from disk.
+        """
+        memo = {} if memo is None else memo
+        new_world = copy(self)
         new_world.bullets = deepcopy(self.bullets, memo)
         new_world.units = deepcopy(self.units, memo)
-        new_world.enemies = deepcopy(self.enemies, memo)
-        new_world.level = deepcopy(self.level, memo)
-        new_world.spawn = deepcopy(self.spawn, memo)
-        # new_world.screenshake = deepcopy(self.screenshake)
+        new_world.enemy_pool = deepcopy(self.enemy_pool, memo)
+        new_world.enemies = new_world.enemy_pool.enemies
+        new_world.level = self.level.snapshot()
+        new_world.screenshake = self.screenshake.copy()
+        new_world.random = copy(self.random)
         return new_world
     
-    def draw(self, screen, matrix, frame, shop=None):
+    def restore(self, snapshot):
+        """
+        Return this world to the state saved in `snapshot`. The snapshot can
+        be restored again later.
+        """
+        self.__dict__.update(snapshot.snapshot().__dict__)
+    
+    def draw(self, screen, matrix, frame, shop=None, alpha=1):
+        """
+        Draw the world `alpha` of the way from the last step to this one.
+        """
+        def blend(last, pos):
+            if last is None or alpha == 1:
+                return pos
+            return last + (pos - last) * alpha
+
+        units = [blend(unit.last, unit.get_pos()) for unit in self.units]
+        enemies = blend(self.enemy_pool.last, self.enemy_pool.pos)
+
         if self.units:
             camera = [
-                self.units[0].x - screen.get_width() // 2,
-                self.units[0].y - screen.get_height() // 2]
+                units[0][0] - screen.get_width() // 2,
+                units[0][1] - screen.get_height() // 2]
         else:
             camera = [0, 0]
         
@@ -104,14 +132,13 @@ class World:
             camera[0] - 2 * self.screenshake[0],
             camera[1] - 2 * self.screenshake[1]))
 
-        for bullet in self.bullets:
-            bullet.draw(screen, camera)
-        for unit in self.units + self.enemies:
+        self.bullets.draw(screen, camera, alpha)
+        for unit, pos in zip(self.units, units):
             if unit.is_alive(matrix, frame):
-                unit.draw(screen, camera)
-
-        if np.any(self.screenshake):
-            self.screenshake = -(self.screenshake // 2)
+                unit.draw(screen, camera, pos)
+        for enemy in self.enemies:
+            if enemy.is_alive(matrix, frame):
+                enemy.draw(screen, camera, enemies[enemy.slot])
         
         # render money in the top right corner
         if shop:
@@ -119,43 +146,106 @@ class World:
             screen.blit(money,
                 (screen.get_width() - money.get_width() - 10, 10))
     
+    def step(self, matrix, frame, shop=None):
+        """
+        Play one frame and refresh the hitzones, whether or not the world is
+        drawn. Positions from before the step are kept to draw between steps.
+        """
+        if np.any(self.screenshake):
+            self.screenshake = -(self.screenshake // 2)
+
+        for unit in self.units:
+            unit.last = unit.get_pos()
+        self.enemy_pool.last = self.enemy_pool.pos.copy()
+
+        self.update(matrix, frame, shop)
+        self.update_hitzones(matrix, frame)
+    
+    def state_hash(self):
+        """
+        Return a 64 bit hash of everything stepping the world changes. Worlds
+        that hash the same on every frame played the same way.
+        """
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(np.array([(unit.id, unit.x, unit.y, unit.reload,
+            unit.speed) for unit in self.units], dtype=float).tobytes())
+
+        pool = self.enemy_pool
+        for array in (pool.pos, pool.hp, pool.reload):
+            digest.update(array[:len(pool)].tobytes())
+
+        live = self.bullets.live()
+        digest.update(live.tobytes())
+        for array in (self.bullets.pos, self.bullets.vel, self.bullets.health,
+                self.bullets.damage, self.bullets.parent):
+            digest.update(array[live].tobytes())
+
+        digest.update(np.uint32(self.level.edits).tobytes())
+        return int.from_bytes(digest.digest(), 'little')
+    
+    def update_hitzones(self, matrix, frame):
+        """
+        Refresh the hitzone of every living unit, the same way drawing them
+        would, so the world can be stepped without a screen.
+        """
+        for unit in self.units:
+            if unit.is_alive(matrix, frame):
+                unit.render()
+        self.enemy_pool.render()
+    
+    def begin_loop(self, matrix, player):
+        """
+        Rotate the matrix so every unit becomes the next ghost, drop the unit
+        that has run out of time, and put the new player at the front.
+        """
+        matrix.rotate()
+        for unit in self.units:
+            unit.set_id(unit.id + 1)
+        self.bullets.parent[self.bullets.parent >= 0] += 1
+        self.units = [player] + [unit for unit in self.units
+            if unit.id < matrix.num_players]
+    
     def update(self, matrix, frame, shop=None):
+
+        # bucket the living units so each bullet only checks the ones near it
+        units = [unit for unit in self.units if unit.is_alive(matrix, frame)]
+        enemies = self.enemy_pool.living()
+        grid = Grid(units + [self.enemies[i] for i in enemies],
+            [(unit.x, unit.y) for unit in units] +
+            self.enemy_pool.pos[enemies].tolist())
         
-        # update the bullets
-        for bullet in self.bullets:
-            bullet.move()
-            if bullet.health <= 0:
-                self.bullets.remove(bullet)
-                continue
-            for unit in self.units + self.enemies:
-                if unit.is_alive(matrix, frame) and bullet.collide(unit):
-                    bullet.collided = unit
-                    if 'on_hit' in dir(bullet):
-                        bullet.on_hit(unit)
-                    self.bullets.remove(bullet)
-                    unit.get_hurt(bullet.damage)
+        # move every bullet, dropping the ones that ran out of time
+        self.bullets.move()
+
+        bounds = self.bullets.get_bounds()
+        for i in self.bullets.live():
+            for unit in grid.query(*bounds[i]):
+                if unit.is_alive(matrix, frame) and \
+                    self.bullets.collide(i, unit):
+                    damage = float(self.bullets.damage[i])
+                    self.bullets.hit(i, unit)
+                    unit.get_hurt(damage)
                     if unit.id == 0:
+                        self.damage_taken += damage
                         self.screenshake = np.array(
-                            [bullet.damage * random.choice((-1, 1)),
-                             bullet.damage * random.choice((-1, 1))],
+                            [damage * self.random.choice((-1, 1)),
+                             damage * self.random.choice((-1, 1))],
                             dtype=int)
                     elif unit.id == -1 and not unit.is_alive(matrix, frame):
                         if shop:
                             shop.collect(unit.reward)
                     break
-            if not bullet.collided and bullet.collide_wall(self.level):
-                self.bullets.remove(bullet)
+        
+        self.bullets.collide_walls(self.level)
 
         # update the units
         for unit in self.units:
             if unit.is_alive(matrix, frame):
                 unit.do_action(matrix, frame, self.bullets, self.level)
         
-        # update the enemies
-        for enemy in self.enemies:
-            if enemy.is_alive(matrix, frame):
-                enemy.do_action(self.units, matrix, frame, self.bullets,
-                    self.level)
+        # update the enemies, all at once
+        self.enemy_pool.update(self.units, matrix, frame, self.bullets,
+            self.level)
 
 
 class Shop:
@@ -167,8 +257,8 @@ class Shop:
         'Agility': (0, 210, 255),
         'Recovery': (110, 70, 250)
     }
-    COLLECTSOUND = pygame.mixer.Sound('resource/sound/pickupCoin.wav')
-    COLLECTSOUND.set_volume(0.5)
+    # the items that can always be bought
+    BASICS = ("Armor", "Battery", "Magnifier", "Plasma", "Socks")
 
     def __init__(self):
         self.stats = {
@@ -179,61 +269,82 @@ class Shop:
             'Recovery': 2
         }
 
-        self.data = json.load(open('resource/data/shop.json'))
+        self.data = assets.get('shop')
+
+        # every recipe as one entry for each material, of the item crafted,
+        # the material and how many of it are used
+        self.names = list(self.data)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        recipes = [(self.index[name], self.index[material], count)
+            for name, item in self.data.items()
+            for material, count in item['materials'].items()]
+        self.crafted, self.materials, self.needed = \
+            np.array(recipes, int).reshape(-1, 3).T
+        self.kinds = np.bincount(self.crafted, minlength=len(self.names))
+        self.basics = np.array([self.index[name] for name in Shop.BASICS])
 
         self.money = 1000
         self.inventory = [None, None, None, None]
         self.items = [None, None, None]
 
-        # load images, if they are found
-        # otherwise, use the image "Unknown"
-        path = "resource/img/item/"
-        unknown = pygame.image.load(path + "Unknown.png")
-        unknown.set_colorkey((0, 0, 0))
-        for item in self.data:
-            try:
-                self.data[item]['image'] = pygame.image.load(
-                    path + item + ".png")
-                self.data[item]['image'].set_colorkey((0, 0, 0))
-            except:
-                self.data[item]['image'] = unknown
+        # rendered cards, and the state of the shop when it was last drawn,
+        # so nothing is drawn again until it changes
+        self.cards = {}
+        self.surface = None
+        self.drawn = None
             
     def collect(self, reward):
         self.money += reward
-        self.COLLECTSOUND.play()
+        assets.get('coin').play()
+    
+    def counts(self):
+        """
+        Return how many of each item is in the inventory.
+        """
+        held = [self.index[item] for item in self.inventory if item]
+        return np.bincount(held, minlength=len(self.names))
+    
+    def craftable(self):
+        """
+        Return whether each item can be crafted from the inventory. Every
+        kind of material used frees a slot for the new item.
+        """
+        space = self.inventory.count(None) + self.kinds
+        short = self.counts()[self.materials] < self.needed
+        missing = np.bincount(self.crafted, short, len(self.names))
+        return (missing == 0) & (space > 0)
     
     def can_craft(self, item):
-        space = self.inventory.count(None)
-        for material, count in self.data[item]['materials'].items():
-            space += 1
-            if self.inventory.count(material) < count:
-                return False
-        return space > 0
+        return bool(self.craftable()[self.index[item]])
     
     def craft(self, item):
-        for material, count in self.data[item]['materials'].items():
-            for _ in range(count):
-                self.remove(self.inventory.index(material))
+        needed = dict(self.data[item]['materials'])
+        for i, material in enumerate(self.inventory):
+            if needed.get(material):
+                needed[material] -= 1
+                self.remove(i)
         self.inventory[self.inventory.index(None)] = item
     
     def refresh(self):
 
         # find all items that can be bought
-        available = ["Armor", "Battery", "Magnifier", "Plasma", "Socks"]
-        for name in self.data:
-            if self.can_craft(name) and name not in available:
-                available.append(name)
+        craftable = self.craftable()
+        craftable[self.basics] = False
+        available = np.concatenate((self.basics, np.flatnonzero(craftable)))
             
         # set weights
-        weights = [1] * 5 + [3] * (len(available) - 5)
+        weights = np.where(np.arange(len(available)) < len(self.basics), 1, 3)
         
-        # pick three random items to make available
+        # pick three random items to make available, the same way as
+        # random.choices, taking away the weight of each item picked
         self.items = []
         for _ in range(3):
-            i = random.choices(range(len(available)), k=1, weights=weights)[0]
-            self.items.append(available[i])
-            available.pop(i)
-            weights.pop(i)
+            cumulative = np.cumsum(weights)
+            i = min(np.searchsorted(cumulative,
+                random.random() * cumulative[-1], 'right'),
+                len(available) - 1)
+            self.items.append(self.names[available[i]])
+            weights[i] = 0
     
     def remove(self, i):
         item = self.inventory[i]
@@ -261,6 +372,21 @@ class Shop:
         for stat, value in self.data[item]['stats'].items():
             self.stats[stat] += value
     
+    def get_build(self):
+        """
+        Return the stats and inventory that players are made with, as a
+        dictionary that can be saved as JSON.
+        """
+        return {'stats': dict(self.stats), 'inventory': list(self.inventory)}
+    
+    def set_build(self, build):
+        """
+        Make players from a build returned by get_build. The stats are used as
+        they are, so they should already count the items in the inventory.
+        """
+        self.stats = dict(build['stats'])
+        self.inventory = list(build.get('inventory', [None] * 4))
+    
     def create_player(self, pos):
         player = Player(pos)
         # player = Minotaur(pos, 0)
@@ -329,17 +455,37 @@ class Shop:
                             return 'Inventory', (j - 2) * 2 + i
         return 'None', None
     
+    def state(self):
+        """
+        Return everything the shop draws, to tell when it has to be drawn
+        again.
+        """
+        return (self.money, tuple(self.stats.values()), tuple(self.items),
+            tuple(self.inventory))
+    
     def draw_card(self, screen, pos, item):
         w, h = screen.get_size()
-        w = w // 5
-        h = h // 5
-        xs, ys = pos
-        xs += 5
+        size = (w // 5, h // 5)
 
-        # draw the card background
-        pygame.draw.rect(screen, (60, 60, 60), (pos[0], pos[1], w, h))
         if item is None:
+            pygame.draw.rect(screen, (60, 60, 60), pos + size)
             return
+        
+        key = (item, size, self.data[item].get('tier'))
+        if key not in self.cards:
+            self.cards[key] = self.render_card(item, size)
+        screen.blit(self.cards[key], pos)
+    
+    def render_card(self, item, size):
+        """
+        Return a new Surface of the card for `item`.
+        """
+        card = pygame.Surface(size)
+        w, h = size
+        xs, ys = 5, 0
+
+        # draw the card background
+        card.fill((60, 60, 60))
 
         # draw a label at the top of the tier's color
         # bronze, then silver, then gold
@@ -348,24 +494,24 @@ class Shop:
             (140, 140, 140),
             (219, 163, 22)
         ]
-        pygame.draw.rect(screen, tiers[self.data[item]['tier'] - 1], (
-            pos[0], pos[1], w, 25))
+        pygame.draw.rect(card, tiers[self.data[item]['tier'] - 1], (
+            0, 0, w, 25))
         
         # render the item name
         text = FONT.render(item, True, (255, 255, 255))
-        screen.blit(text, (xs, ys + 3))
+        card.blit(text, (xs, ys + 3))
 
         # render the cost in the top right
         text = FONT.render(f"${self.data[item]['cost']}", True,
             (255, 255, 255))
-        screen.blit(text, (xs + w - text.get_width() - 16, ys + 3))
+        card.blit(text, (xs + w - text.get_width() - 16, ys + 3))
 
         # blit the image
         text_h = text.get_height()
-        img = pygame.transform.scale(self.data[item]['image'],
+        img = pygame.transform.scale(assets.get('item/' + item),
             (h - text_h, h - text_h))
         img.set_colorkey((0, 0, 0))
-        screen.blit(img, (xs, ys + text_h))
+        card.blit(img, (xs, ys + text_h))
 
         # render the item's stats with colored numbers on the right
         ys += h - 3
@@ -374,10 +520,11 @@ class Shop:
                 f"{'+' if stat_value > 0 else '-'} {str(abs(stat_value))}",
                 True, Shop.COLOR[stat_name])
             ys -= text.get_height()
-            if ys <= pos[1] + 25:
+            if ys <= 25:
                 ys += text.get_height() * 2
                 xs -= 50
-            screen.blit(text, (xs + w - text.get_width() - 16, ys))
+            card.blit(text, (xs + w - text.get_width() - 16, ys))
+        return card
     
     def draw_shop(self, screen):
 
@@ -459,13 +606,15 @@ class Shop:
         dy = (bar_h - text.get_height()) // 2
         screen.blit(text, (dy, dy))
 
-        shopsurf = pygame.Surface((w, h - bar_h))
-        self.draw_shop(shopsurf)
-        screen.blit(shopsurf, (0, bar_h))
+        if self.surface is None or self.surface.get_size() != (w, h - bar_h):
+            self.surface = pygame.Surface((w, h - bar_h))
+        self.draw_shop(self.surface)
+        screen.blit(self.surface, (0, bar_h))
     
     def run(self, screen):
         w, h = screen.get_size()
         self.refresh()
+        self.drawn = None
 
         bar_h = 60
 
@@ -473,6 +622,8 @@ class Shop:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     sys.exit()
+                if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    self.drawn = None
                 if event.type == pygame.MOUSEBUTTONDOWN:
                     if event.button == 1:
                         pos = pygame.mouse.get_pos()
@@ -492,19 +643,35 @@ class Shop:
                             self.money += self.data[self.inventory[pressed]]['cost']
                             self.remove(pressed)
             
-            self.draw(screen, bar_h)
-            pygame.display.flip()
+            # only draw again when something in the shop has changed
+            state = self.state()
+            if state != self.drawn:
+                self.draw(screen, bar_h)
+                pygame.display.flip()
+                self.drawn = state
             pygame.time.wait(10)
 
 
 class TimeKeeper:
 
-    def __init__(self, screensize):
+    # how often the screen is drawn, and the most steps made between draws
+    # when the game falls behind
+    DRAW_RATE = 60
+    MAX_STEPS = 5
+
+    def __init__(self, screensize, record=None):
+        pygame.init()
+
         self.w, self.h = screensize
         self.screen = pygame.display.set_mode(screensize)
         pygame.display.set_caption("Time Keeper")
         self.clock = pygame.time.Clock()
 
+        # show the window while everything is loaded in the background
+        loader = assets.Loader()
+        loader.start()
+        assets.loading_screen(self.screen, loader)
+
         self.world = World()
 
         self.shop = Shop()
@@ -519,6 +686,10 @@ class TimeKeeper:
         pygame.mixer.music.load('resource/sound/20sec.mp3')
         # pygame.mixer.music.set_volume(0)
 
+        # every loop is streamed here so it can be replayed headless
+        self.recorder = record and ReplayWriter(record,
+            self.per_second * self.spawn_rate * self.num_players)
+
         self.reset()
     
     def wait(self, n):
@@ -539,7 +710,7 @@ class TimeKeeper:
 
         Unit.mute()
         for frame in range(self.per_second * self.spawn_rate):
-            self.world.update(self.matrix, frame)
+            self.world.step(self.matrix, frame)
             self.world.draw(self.screen, self.matrix, frame)
             pygame.display.flip()
             self.clock.tick(30)
@@ -547,46 +718,66 @@ class TimeKeeper:
 
         start = time.time()
 
-        self.matrix.rotate()
-        for unit in self.world.units:
-            unit.set_id(unit.id + 1)
-            if unit.id >= self.num_players:
-                self.world.units.remove(unit)
         # new_player = Player(self.world.spawn, 0)
         new_player = self.shop.create_player(self.world.spawn)
+        self.world.begin_loop(self.matrix, new_player)
 
-        self.world.units = [new_player] + self.world.units
-        self.instance = deepcopy(self.world)
+        self.instance = self.world.snapshot()
         self.instance.screenshake = np.zeros(2)
+        self.instance.damage_taken = 0
         self.frame = 0
+        if self.recorder:
+            self.recorder.begin_loop(self.shop.get_build())
 
         interval = time.time() - start
 
         self.wait(1 - float(interval))
     
     def run(self):
+        # the world is stepped per_second times a second, however often it is
+        # drawn, and drawn blended between its last two steps
+        step = 1 / self.per_second
+        lag = 0
         while True:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     sys.exit()
-            
-            action = Player.read_action(self.screen, pygame.mouse.get_pos(),
-                pygame.mouse.get_pressed())
-            self.matrix.save_action(self.frame, action)
 
-            self.clock.tick(30)
-            self.instance.update(self.matrix, self.frame, self.shop)
-            self.instance.draw(self.screen, self.matrix, self.frame, self.shop)
+            lag += self.clock.tick(TimeKeeper.DRAW_RATE) / 1000
+            lag = min(lag, TimeKeeper.MAX_STEPS * step)
+            while lag >= step:
+                lag -= step
+                self.step()
+                if self.frame == 0:
+                    lag = 0
+            
+            self.instance.draw(self.screen, self.matrix,
+                max(self.frame - 1, 0), self.shop, lag / step)
             pygame.display.flip()
-            self.frame += 1
-
-            if self.frame >= self.per_second * self.spawn_rate * self.num_players:
-                self.screen.fill((0, 0, 0))
-                pygame.display.flip()
-                self.wait(4)
-                self.reset()
+    
+    def step(self):
+        """
+        Play the player's current action on the next frame, and start the
+        next loop after the last frame.
+        """
+        action = Player.read_action(self.screen, pygame.mouse.get_pos(),
+            pygame.mouse.get_pressed())
+        self.matrix.save_action(self.frame, action)
+        if self.recorder:
+            self.recorder.save_action(self.frame, action)
+
+        self.instance.step(self.matrix, self.frame, self.shop)
+        self.frame += 1
+
+        if self.frame >= self.per_second * self.spawn_rate * self.num_players:
+            if self.recorder:
+                self.recorder.end_loop()
+            self.screen.fill((0, 0, 0))
+            pygame.display.flip()
+            self.wait(4)
+            self.reset()
 
 
 if __name__ == "__main__":
-    game = TimeKeeper((1000, 700))
+    game = TimeKeeper((1000, 700), sys.argv[1] if len(sys.argv) > 1 else None)
     game.run()
@@ -1,20 +1,80 @@
 import pygame
 import numpy as np
+import json
+import os
+import zlib
+from collections import OrderedDict
+from copy import copy
 
 from generate import ground_img
 
+def checksum(crc, *arrays):
+    """
+    Return the CRC-32 `crc` continued over the bytes of each array.
+    """
+    for array in arrays:
+        crc = zlib.crc32(np.ascontiguousarray(array).tobytes(), crc)
+    return crc
+
+def distance_to(mask, cap):
+    """
+    Return the distance from each point to the nearest True point in `mask`,
+    up to `cap`. Points past the edges of the mask are not counted.
+    """
+    w, h = mask.shape
+    y = np.arange(h, dtype=np.int32)
+
+    # the distance to the nearest True point in the same column
+    before = np.maximum.accumulate(np.where(mask, y, -h - cap), axis=1)
+    after = np.minimum.accumulate(
+        np.where(mask, y, 2 * h + cap)[:, ::-1], axis=1)[:, ::-1]
+    column = np.minimum(np.minimum(y - before, after - y), cap)
+
+    # squared distances up to 2 * cap * cap fit in 16 bits, which halves the
+    # memory each pass below reads and writes
+    column = column.astype(np.int16) ** 2
+
+    # the nearest point in any column within the cap
+    best = column.copy()
+    shifted = np.empty_like(column)
+    for dx in range(1, min(cap, w - 1) + 1):
+        np.add(column[:-dx], dx * dx, out=shifted[:-dx])
+        np.minimum(best[dx:], shifted[:-dx], out=best[dx:])
+        np.add(column[dx:], dx * dx, out=shifted[dx:])
+        np.minimum(best[:-dx], shifted[dx:], out=best[:-dx])
+
+    return np.sqrt(np.minimum(best, cap * cap), dtype=np.float32)
+
+def signed_distance(walls, cap):
+    """
+    Return how far each point is from the nearest wall, rounded down, or how
+    deep it is inside a wall as a negative number, up to `cap`.
+    """
+    return np.floor(distance_to(walls, cap) - distance_to(~walls, cap)
+        ).astype(np.int8)
+
 class Level:
     """
     An environment for units to travel in.
 
     Attributes:
-        terrain: A 2D numpy array of integers. 0 is empty, 1 is wall.
+        terrain: A 2D numpy array of bytes. 0 is empty, 1 is wall.
+        terrain_flat: `terrain` as a 1D array. Both are views of the same
+            buffer, so writing to one writes to the other.
         spawn: A tuple (x, y) of the spawn location.
         enemies: A list of Enemy spawn locations.
+        sdf: The signed distance from each point to the nearest wall, in
+            whole pixels up to DISTANCE_CAP. Made with the level, so every
+            snapshot shares it, and then only updated around the places
+            walls are added. Taking walls away can only move points further
+            from them, so there the old distances are left as they are.
+        edits: A CRC-32 of every change made to the terrain, so levels can be
+            compared without comparing their terrain.
     """
 
+    DISTANCE_CAP = 32
+
     def __init__(self, terrain: np.array, spawn, enemies, ground=None):
-        self.terrain = terrain
         self.spawn = spawn
         self.enemies = enemies
 
@@ -24,30 +84,100 @@ class Level:
         else:
             self.ground = ground_img((self.w, self.h))
         
-        self.terrain_flat = self.terrain.flatten()
+        self.terrain_flat = np.ascontiguousarray(terrain).reshape(-1)
+        self.terrain = self.terrain_flat.reshape((self.w, self.h))
+
+        # the terrain as white on a transparent Surface, made on first draw
+        # and then only updated in the rectangles that change
+        self.surface = None
+        self.dirty = []
+
+        self.sdf = np.ascontiguousarray(
+            self.region_distance(0, 0, self.w, self.h))
+        self.sdf_dirty = []
+
+        self.edits = 0
+
+        # set when the terrain, its surface or its distance field may be
+        # shared with a snapshot, so they are copied before they next change
+        self.shared = False
+        self.surface_shared = False
+        self.sdf_shared = False
         
-    def _flat(self, n):
-        if n.shape == (2,):
-            # single point
-            return (n[0].astype(int) * self.h + n[1]).astype(int)
-        return (n[:, 0].astype(int) * self.h + n[:, 1]).astype(int)
+    def _index(self, points):
+        """
+        Return the index in `terrain_flat` of each (x, y) in `points`, clipped
+        to the level, and whether each point is inside the level.
+        """
+        points = np.asarray(points)
+        x = points[..., 0].astype(np.intp)
+        y = points[..., 1].astype(np.intp)
+        inside = ((points[..., 0] >= 0) & (x < self.w) &
+            (points[..., 1] >= 0) & (y < self.h))
+        index = np.clip(x, 0, self.w - 1) * self.h + np.clip(y, 0, self.h - 1)
+        return index, inside
     
     def __deepcopy__(self, _):
-        return Level(self.terrain.copy(), self.spawn, self.enemies,
-            self.ground)
+        return self.snapshot()
+    
+    def snapshot(self):
+        """
+        Return a copy of the level that shares its ground, spawn points and,
+        until either level changes it, its terrain.
+        """
+        level = copy(self)
+        level.dirty = list(self.dirty)
+        level.sdf_dirty = list(self.sdf_dirty)
+        self.shared = level.shared = True
+        self.surface_shared = level.surface_shared = True
+        self.sdf_shared = level.sdf_shared = True
+        return level
+    
+    def _own(self):
+        # copy the terrain before changing it if a snapshot may share it
+        if self.shared:
+            self.terrain_flat = self.terrain_flat.copy()
+            self.terrain = self.terrain_flat.reshape((self.w, self.h))
+            self.shared = False
     
     def __getitem__(self, key):
         if key.shape == (0,):
             return []
-        return self.terrain_flat[self._flat(key)]
+        return self.query(key)
+    
+    def contains(self, points):
+        """
+        Return whether each (x, y) in `points` is inside the level.
+        """
+        return self._index(points)[1]
+    
+    def at(self, x, y):
+        """
+        Return the terrain at a single point. Outside the level is wall.
+        """
+        if 0 <= x < self.w and 0 <= y < self.h:
+            return self.terrain_flat[int(x) * self.h + int(y)]
+        return 1
+    
+    def query(self, points):
+        """
+        Return the terrain at each (x, y) in `points`, which can be an array
+        of any shape ending in 2. Outside the level is wall.
+        """
+        index, inside = self._index(points)
+        return np.where(inside, self.terrain_flat[index], 1)
         
     @staticmethod
-    def from_image(filepath):
+    def read_image(filepath):
+        """
+        Return the terrain, spawn location and enemy spawn locations drawn in
+        an image.
+        """
         img = pygame.image.load(filepath)
         data = pygame.surfarray.pixels3d(img)
 
-        # terrain is a 2D array of integers. 1 where data is black, else 0.
-        terrain = np.all(data == (0, 0, 0), axis=2).astype(int)
+        # terrain is a 2D array of bytes. 1 where data is black, else 0.
+        terrain = np.all(data == (0, 0, 0), axis=2).astype(np.uint8)
 
         # find the spawn location, where the image is blue
         spawn = np.argwhere(np.all(data == (0, 0, 255), axis=2))[0]
@@ -55,47 +185,448 @@ class Level:
         # find the enemy spawn locations, where the image is red
         enemies = np.argwhere(np.all(data == (255, 0, 0), axis=2))
 
-        return Level(terrain, spawn, enemies)
+        return terrain, spawn, enemies
+
+    @staticmethod
+    def from_image(filepath):
+        return Level(*Level.read_image(filepath))
     
     def set_at(self, key, value):
-        self.terrain_flat[self._flat(key)] = value
-        self.terrain = self.terrain_flat.reshape((self.w, self.h))
+        self._own()
+        index, inside = self._index(key)
+        self.terrain_flat[index[inside]] = value
+        self.edits = checksum(self.edits, key, np.array(value))
+
+        points = np.reshape(key, (-1, 2))
+        if len(points):
+            left, top = np.min(points, axis=0)
+            right, bottom = np.max(points, axis=0) + 1
+            self.mark_dirty(left, top, right, bottom, np.any(value))
+    
+    def carve(self, center, stencil, value):
+        """
+        Set every point under `stencil`, a square boolean mask centered on
+        `center`, to `value`. The parts of the mask outside the level are
+        ignored.
+        """
+        rad = stencil.shape[0] // 2
+        x, y = int(center[0]) - rad, int(center[1]) - rad
+
+        left, right = max(x, 0), min(x + stencil.shape[0], self.w)
+        top, bottom = max(y, 0), min(y + stencil.shape[1], self.h)
+        if left >= right or top >= bottom:
+            return
+
+        self._own()
+        self.terrain[left:right, top:bottom][
+            stencil[left - x:right - x, top - y:bottom - y]] = value
+        self.mark_dirty(left, top, right, bottom, value != 0)
+        self.edits = checksum(self.edits, np.array((x, y, value)), stencil)
+    
+    def mark_dirty(self, left, top, right, bottom, walls=True):
+        """
+        Queue part of the terrain to be copied to `self.surface` before it
+        is next drawn, and, if `walls` may have been added there, for
+        `self.sdf` to be updated around it.
+        """
+        left, right = max(int(left), 0), min(int(right), self.w)
+        top, bottom = max(int(top), 0), min(int(bottom), self.h)
+        if left < right and top < bottom:
+            self.dirty.append((left, top, right - left, bottom - top))
+            if walls:
+                self.sdf_dirty.append((left, top, right, bottom))
+    
+    def region_distance(self, left, top, right, bottom):
+        """
+        Return the signed distance field of part of the level. Only walls
+        inside the part, and the edges of the level, are counted.
+        """
+        walls = self.terrain[left:right, top:bottom] != 0
+
+        # outside the level is wall
+        pad = ((int(left == 0), int(right == self.w)),
+            (int(top == 0), int(bottom == self.h)))
+        walls = np.pad(walls, pad, constant_values=True)
+        sdf = signed_distance(walls, Level.DISTANCE_CAP)
+        return sdf[pad[0][0]:sdf.shape[0] - pad[0][1],
+            pad[1][0]:sdf.shape[1] - pad[1][1]]
+    
+    def update_distance(self):
+        """
+        Update `self.sdf` around the places walls have been added.
+        """
+        if self.sdf_dirty and self.sdf_shared:
+            self.sdf = self.sdf.copy()
+            self.sdf_shared = False
+
+        # a change can only be felt up to the cap away, and those points
+        # can only see walls up to the cap further
+        cap = Level.DISTANCE_CAP
+        for left, top, right, bottom in self.sdf_dirty:
+            l, r = max(left - cap, 0), min(right + cap, self.w)
+            t, b = max(top - cap, 0), min(bottom + cap, self.h)
+            l2, r2 = max(l - cap, 0), min(r + cap, self.w)
+            t2, b2 = max(t - cap, 0), min(b + cap, self.h)
+            self.sdf[l:r, t:b] = self.region_distance(l2, t2, r2, b2)[
+                l - l2:r - l2, t - t2:b - t2]
+        self.sdf_dirty = []
+    
+    def distance(self, points):
+        """
+        Return at most how far each (x, y) in `points` is from the nearest
+        wall, in whole pixels up to DISTANCE_CAP. Points in walls or outside
+        the level are negative, as are points in walls that have since been
+        taken away.
+        """
+        self.update_distance()
+        index, inside = self._index(points)
+        return np.where(inside, self.sdf.reshape(-1)[index], -1)
+    
+    def update_surface(self):
+        if self.surface is None:
+            self.surface = pygame.surfarray.make_surface(
+                self.terrain.astype(np.uint8) * 255)
+            self.surface.set_colorkey((0, 0, 0))
+            self.surface_shared = False
+            self.dirty = []
+
+        if self.dirty and self.surface_shared:
+            self.surface = self.surface.copy()
+            self.surface_shared = False
+
+        for rect in self.dirty:
+            left, top, w, h = rect
+            pygame.surfarray.blit_array(self.surface.subsurface(rect),
+                self.terrain[left:left + w, top:top + h].astype(np.uint8) * 255)
+        self.dirty = []
     
     def draw(self, screen, camera):
         
         left, top = map(int, camera)
 
-        offset_l, offset_t = 0, 0
-        if left < 0:
-            offset_l = -left
-            left = 0
-        if top < 0:
-            offset_t = -top
-            top = 0
-        
-        right = left + screen.get_width() + 1
-        bottom = top + screen.get_height() + 1
-
-        # generate a surface with the terrain
-        terr = self.terrain[left:right, top:bottom].astype(np.uint8) * 255
-        surf = pygame.surfarray.make_surface(terr)
-        surf.set_colorkey((0, 0, 0))
+        # bring the terrain surface up to date with any new craters
+        self.update_surface()
 
         # draw the terrain
         screen.blit(self.ground, (-camera[0], -camera[1]))
-        screen.blit(surf, (offset_l, offset_t))
-        # if offset_l > 0:
-        #     pygame.draw.rect(screen, (255, 255, 255), 
-        #         (0, 0, offset_l, screen.get_height()))
-        # if offset_t > 0:
-        #     pygame.draw.rect(screen, (255, 255, 255), 
-        #         (0, 0, screen.get_width(), offset_t))
-        # if right > self.w:
-        #     pygame.draw.rect(screen, (255, 255, 255), 
-        #         (right - self.w, 0, screen.get_width(), screen.get_height()))
-        # if bottom > self.h:
-        #     pygame.draw.rect(screen, (255, 255, 255), 
-        #         (0, bottom - self.h, screen.get_width(), screen.get_height()))
+        screen.blit(self.surface, (-left, -top))
+
+class ChunkedLevel:
+    """
+    A level that is stored on disk in square chunks, for maps too big to keep
+    in memory. The terrain file is memory-mapped, so only the chunks that are
+    looked at are read, and only the chunks near the camera are drawn.
+
+    Each chunk is stored with eight points to a byte, packed along y with
+    np.packbits. Changed chunks are copied into memory, so the file itself
+    is never written to while playing.
+
+    Attributes:
+        w, h: The width and height of the level.
+        spawn: A tuple (x, y) of the spawn location.
+        enemies: A list of Enemy spawn locations.
+        size: The width and height of each chunk.
+        chunks: The memory-mapped, packed terrain, with shape
+            (columns, rows, size, size // 8). A set bit is wall.
+        slots: The index in `edited` of each chunk, or -1 if the chunk has
+            not been changed.
+        edited: The changed chunks. Only the first `count` are in use.
+        surfaces: The most recently drawn chunks, oldest first.
+        ground: A square of ground GROUND_CHUNKS chunks wide that is repeated
+            under the terrain. Made on first draw.
+        edits: A CRC-32 of every change made to the terrain, like
+            Level.edits.
+    """
+
+    SIZE = 256
+    CACHE_SIZE = 64
+    GROUND_CHUNKS = 8
+
+    def __init__(self, path):
+        with open(os.path.join(path, 'level.json')) as f:
+            info = json.load(f)
+        self.w, self.h = info['shape']
+        self.spawn = np.array(info['spawn'])
+        self.enemies = np.array(info['enemies'], dtype=int).reshape(-1, 2)
+        self.seed = info['seed']
+
+        self.chunks = np.load(os.path.join(path, 'terrain.npy'),
+            mmap_mode='r')
+        self.size = self.chunks.shape[2]
+
+        self.slots = np.full(self.chunks.shape[:2], -1, dtype=np.intp)
+        self.edited = np.zeros((0, self.size, self.size // 8),
+            dtype=np.uint8)
+        self.count = 0
+        self.shared = False
+        self.edits = 0
+
+        self.surfaces = OrderedDict()
+        self.ground = None
+    
+    @staticmethod
+    def save(path, terrain, spawn, enemies, size=SIZE, seed=0):
+        """
+        Write a level to `path`, a directory, one column of chunks at a time.
+        `terrain` can itself be a memory-mapped array. `size` must be a
+        multiple of 8.
+        """
+        w, h = terrain.shape
+        cols, rows = -(-w // size), -(-h // size)
+
+        os.makedirs(path, exist_ok=True)
+        chunks = np.lib.format.open_memmap(os.path.join(path, 'terrain.npy'),
+            mode='w+', dtype=np.uint8, shape=(cols, rows, size, size // 8))
+        for cx in range(cols):
+            column = np.zeros((size, rows * size), dtype=bool)
+            strip = terrain[cx * size:(cx + 1) * size]
+            column[:strip.shape[0], :h] = strip
+            chunks[cx] = np.packbits(column, axis=-1).reshape(
+                size, rows, size // 8).transpose(1, 0, 2)
+        chunks.flush()
+        del chunks
+
+        with open(os.path.join(path, 'level.json'), 'w') as f:
+            json.dump({
+                'shape': [w, h],
+                'spawn': [int(n) for n in spawn],
+                'enemies': np.asarray(enemies, dtype=int).tolist(),
+                'seed': seed
+            }, f)
+    
+    @staticmethod
+    def from_image(filepath, path, size=SIZE):
+        ChunkedLevel.save(path, *Level.read_image(filepath), size=size)
+        return ChunkedLevel(path)
+    
+    def __deepcopy__(self, _):
+        return self.snapshot()
+    
+    def __getitem__(self, key):
+        if key.shape == (0,):
+            return []
+        return self.query(key)
+    
+    def snapshot(self):
+        """
+        Return a copy of the level that shares the terrain file, and shares
+        its changed chunks until either level changes them.
+        """
+        level = copy(self)
+        level.surfaces = self.surfaces.copy()
+        self.shared = level.shared = True
+        return level
+    
+    def _own(self):
+        # copy the changed chunks before changing them if a snapshot may
+        # share them
+        if self.shared:
+            self.slots = self.slots.copy()
+            self.edited = self.edited.copy()
+            self.shared = False
+    
+    def _index(self, points):
+        """
+        Return the chunk column, chunk row, and position within the chunk of
+        each (x, y) in `points`, clipped to the level, and whether each
+        point is inside the level.
+        """
+        points = np.asarray(points)
+        x = points[..., 0].astype(np.intp)
+        y = points[..., 1].astype(np.intp)
+        inside = ((points[..., 0] >= 0) & (x < self.w) &
+            (points[..., 1] >= 0) & (y < self.h))
+        x = np.clip(x, 0, self.w - 1)
+        y = np.clip(y, 0, self.h - 1)
+        return (x // self.size, y // self.size, x % self.size,
+            y % self.size, inside)
+    
+    def contains(self, points):
+        return self._index(points)[4]
+    
+    def at(self, x, y):
+        return self.query(np.array((x, y)))
+    
+    def query(self, points):
+        """
+        Return the terrain at each (x, y) in `points`, which can be an array
+        of any shape ending in 2. Outside the level is wall.
+        """
+        cx, cy, ox, oy, inside = self._index(points)
+        byte, bit = oy >> 3, 7 - (oy & 7)
+        packed = np.array(self.chunks[cx, cy, ox, byte])
+
+        slot = self.slots[cx, cy]
+        edited = slot >= 0
+        if np.any(edited):
+            packed[edited] = self.edited[slot[edited], ox[edited],
+                byte[edited]]
+
+        return np.where(inside, (packed >> bit) & 1, 1)
+    
+    def distance(self, points):
+        """
+        Chunked levels keep no distance field, so every point is reported as
+        touching a wall and callers fall back to exact tests.
+        """
+        return np.zeros(np.shape(points)[:-1], dtype=np.int8)
+    
+    def get_chunk(self, cx, cy):
+        """
+        Return the chunk unpacked, with one byte per point.
+        """
+        if self.slots[cx, cy] >= 0:
+            return np.unpackbits(self.edited[self.slots[cx, cy]], axis=-1)
+        return np.unpackbits(self.chunks[cx, cy], axis=-1)
+    
+    def edit_chunk(self, cx, cy):
+        """
+        Return the chunk's slot in `edited`, copying it into memory the first
+        time.
+        """
+        self._own()
+        if self.slots[cx, cy] < 0:
+            if self.count == len(self.edited):
+                self.edited = np.concatenate((self.edited,
+                    np.zeros((max(self.count, 4),) + self.edited.shape[1:],
+                    dtype=np.uint8)))
+            self.edited[self.count] = self.chunks[cx, cy]
+            self.slots[cx, cy] = self.count
+            self.count += 1
+
+        # the chunk has to be drawn again
+        self.surfaces.pop((cx, cy), None)
+
+        return self.slots[cx, cy]
+    
+    def set_at(self, key, value):
+        cx, cy, ox, oy, inside = self._index(np.reshape(key, (-1, 2)))
+        cx, cy, ox, oy = cx[inside], cy[inside], ox[inside], oy[inside]
+        for x, y in set(zip(cx.tolist(), cy.tolist())):
+            self.edit_chunk(x, y)
+
+        index = (self.slots[cx, cy], ox, oy >> 3)
+        mask = (1 << (7 - (oy & 7))).astype(np.uint8)
+        if value:
+            np.bitwise_or.at(self.edited, index, mask)
+        else:
+            np.bitwise_and.at(self.edited, index, ~mask)
+        self.edits = checksum(self.edits, key, np.array(value))
+    
+    def carve(self, center, stencil, value):
+        """
+        Set every point under `stencil`, a square boolean mask centered on
+        `center`, to `value`. The parts of the mask outside the level are
+        ignored.
+        """
+        rad = stencil.shape[0] // 2
+        x, y = int(center[0]) - rad, int(center[1]) - rad
+
+        left, right = max(x, 0), min(x + stencil.shape[0], self.w)
+        top, bottom = max(y, 0), min(y + stencil.shape[1], self.h)
+        if left >= right or top >= bottom:
+            return
+
+        # carve the part of the stencil over each chunk it touches
+        for cx in range(left // self.size, (right - 1) // self.size + 1):
+            for cy in range(top // self.size, (bottom - 1) // self.size + 1):
+                l = max(left, cx * self.size)
+                r = min(right, (cx + 1) * self.size)
+                t = max(top, cy * self.size)
+                b = min(bottom, (cy + 1) * self.size)
+
+                slot = self.edit_chunk(cx, cy)
+                chunk = np.unpackbits(self.edited[slot], axis=-1)
+                chunk[l - cx * self.size:r - cx * self.size,
+                      t - cy * self.size:b - cy * self.size][
+                    stencil[l - x:r - x, t - y:b - y]] = value
+                self.edited[slot] = np.packbits(chunk, axis=-1)
+        self.edits = checksum(self.edits, np.array((x, y, value)), stencil)
+    
+    def get_surface(self, cx, cy):
+        """
+        Return the chunk drawn on its own patch of ground, drawing it if it
+        is not one of the CACHE_SIZE most recently drawn chunks.
+        """
+        if (cx, cy) in self.surfaces:
+            self.surfaces.move_to_end((cx, cy))
+            return self.surfaces[(cx, cy)]
+        
+        # the ground repeats every GROUND_CHUNKS chunks
+        if self.ground is None:
+            side = self.size * ChunkedLevel.GROUND_CHUNKS
+            self.ground = ground_img((side, side), self.seed)
+        n = ChunkedLevel.GROUND_CHUNKS
+        surf = self.ground.subsurface(((cx % n) * self.size,
+            (cy % n) * self.size, self.size, self.size)).copy()
+
+        terr = pygame.surfarray.make_surface(self.get_chunk(cx, cy) * 255)
+        terr.set_colorkey((0, 0, 0))
+        surf.blit(terr, (0, 0))
+
+        self.surfaces[(cx, cy)] = surf
+        if len(self.surfaces) > ChunkedLevel.CACHE_SIZE:
+            self.surfaces.popitem(last=False)
+        return surf
+    
+    def draw(self, screen, camera):
+
+        left, top = map(int, camera)
+        right = left + screen.get_width()
+        bottom = top + screen.get_height()
+
+        cols, rows = self.slots.shape
+        for cx in range(max(left // self.size, 0),
+                min(right // self.size + 1, cols)):
+            for cy in range(max(top // self.size, 0),
+                    min(bottom // self.size + 1, rows)):
+                screen.blit(self.get_surface(cx, cy),
+                    (cx * self.size - left, cy * self.size - top))
+
+
+class Grid:
+    """
+    A uniform grid that buckets units by the cell their center is in, so the
+    units near a point can be found without checking every unit.
+
+    Attributes:
+        reach: The largest collision radius of any unit in the grid.
+        size: The width and height of each cell.
+        cells: A dictionary from (column, row) to a list of (index, unit).
+    """
+
+    def __init__(self, units, pos=None):
+        """
+        `pos` can hold the (x, y) of each unit if they are already known.
+        """
+        self.reach = max((unit.collision_radius for unit in units),
+            default=1)
+        self.size = 2 * self.reach
+        self.cells = {}
+
+        if pos is None:
+            pos = [(unit.x, unit.y) for unit in units]
+        keys = np.floor_divide(np.reshape(pos, (-1, 2)), self.size)
+        for i, (unit, key) in enumerate(zip(units, keys.astype(int).tolist())):
+            self.cells.setdefault(tuple(key), []).append((i, unit))
+
+    def query(self, left, top, right, bottom):
+        """
+        Return every unit that could reach into the box, in the order the
+        units were given.
+        """
+        left, top = left - self.reach, top - self.reach
+        right, bottom = right + self.reach, bottom + self.reach
+
+        found = []
+        for x in range(int(left // self.size), int(right // self.size) + 1):
+            for y in range(int(top // self.size),
+                    int(bottom // self.size) + 1):
+                found.extend(self.cells.get((x, y), ()))
+        found.sort(key=lambda pair: pair[0])
+
+        return [unit for _, unit in found]
+
 
 if __name__ == "__main__":
     test = Level.from_image("level/test.png")